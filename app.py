@@ -2,9 +2,15 @@ import os
 import streamlit as st
 import google.generativeai as genai
 from dotenv import load_dotenv
-from neo4j import GraphDatabase
 import json
-from config import CATEGORY_KEYWORDS
+from config import CATEGORY_KEYWORDS, LLM_CATEGORY_REFINEMENT, CATEGORY_REFINEMENT_CANDIDATES, CATEGORY_TOP_K, RETRIEVAL_TOP_K
+from category_classifier import CategoryClassifier
+from retrieval import HybridRetriever
+from graph_queries import fetch_articles_by_subcategories, ArticleCache
+from graph_schema import ensure_schema
+from graph_connection import create_driver, is_healthy
+from llm_cache import get_llm_cache
+from streaming import timed_stream
 
 load_dotenv()
 
@@ -14,11 +20,62 @@ NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.5-flash-preview-04-17')
+MODEL_NAME = 'gemini-2.5-flash-preview-04-17'
+model = genai.GenerativeModel(MODEL_NAME)
+llm_cache = get_llm_cache()
+REPORT_FALLBACK = "# FINANCIAL INTELLIGENCE REPORT\n\n## Notice\n\nWe're currently experiencing high demand on our analysis systems. Our team is working to generate your financial intelligence report as soon as possible.\n\nIn the meantime, please review the historical precedent articles below, which contain valuable insights related to your query.\n\nThank you for your patience."
 
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+@st.cache_resource(validate=is_healthy)
+def get_driver():
+    # One pooled driver per server process, shared by every session and rerun
+    return create_driver(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
 
-def get_relevant_categories(news_text, CATEGORY_KEYWORDS=CATEGORY_KEYWORDS):
+@st.cache_resource
+def get_article_cache():
+    return ArticleCache()
+
+@st.cache_resource
+def bootstrap_graph_schema():
+    # Runs once per server process; a failure degrades query speed but must not take the app down
+    try:
+        ensure_schema(get_driver())
+    except Exception as e:
+        print(f"Neo4j schema bootstrap failed: {str(e)}")
+
+bootstrap_graph_schema()
+
+def parse_categories_response(response_text):
+    response_text = response_text.strip()
+    
+    if response_text.startswith("```") and response_text.endswith("```"):
+        clean_text = response_text.split("```")[1].strip()
+        if clean_text.startswith("json"):
+            clean_text = clean_text[4:].strip()
+    elif response_text.startswith("[") and response_text.endswith("]"):
+        clean_text = response_text
+    else:
+        lines = response_text.split('\n')
+        for line in lines:
+            line = line.strip()
+            if line.startswith("[") and line.endswith("]"):
+                clean_text = line
+                break
+        else:
+            clean_text = response_text
+    
+    return eval(clean_text)
+
+def parse_json_response(result_text):
+    if '```json' in result_text:
+        json_str = result_text.split('```json')[1].split('```')[0].strip()
+    elif '```' in result_text:
+        json_str = result_text.split('```')[1].split('```')[0].strip()
+    else:
+        json_str = result_text.strip()
+    
+    return json.loads(json_str)
+
+def refine_categories_with_llm(news_text, CATEGORY_KEYWORDS=CATEGORY_KEYWORDS):
     prompt = f"""
     Analyze this news article and select ONLY the most relevant categories and subcategories strictly from the Categories Keywords provided below:
     News: {news_text}
@@ -36,26 +93,11 @@ def get_relevant_categories(news_text, CATEGORY_KEYWORDS=CATEGORY_KEYWORDS):
     
     while retry_count < max_retries:
         try:
-            response = model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            if response_text.startswith("```") and response_text.endswith("```"):
-                clean_text = response_text.split("```")[1].strip()
-                if clean_text.startswith("json"):
-                    clean_text = clean_text[4:].strip()
-            elif response_text.startswith("[") and response_text.endswith("]"):
-                clean_text = response_text
-            else:
-                lines = response_text.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith("[") and line.endswith("]"):
-                        clean_text = line
-                        break
-                else:
-                    clean_text = response_text
-            
-            categories = eval(clean_text)
+            categories = llm_cache.cached_call(
+                MODEL_NAME, "categories-v1", prompt,
+                lambda: model.generate_content(prompt).text,
+                parse_categories_response
+            )
             return categories
             
         except Exception as e:
@@ -69,39 +111,58 @@ def get_relevant_categories(news_text, CATEGORY_KEYWORDS=CATEGORY_KEYWORDS):
                 print(f"Error parsing categories after {max_retries} attempts: {str(e)}")
                 return []
 
-def fetch_all_articles_by_categories(categories):
-    articles = []
+@st.cache_resource
+def load_category_classifier():
+    return CategoryClassifier()
+
+def get_relevant_categories(news_text):
+    if not LLM_CATEGORY_REFINEMENT:
+        candidates = load_category_classifier().classify(news_text)
+        return [(category, subcategory) for category, subcategory, _ in candidates]
+    
+    # The LLM only chooses among the classifier's shortlist instead of the full keyword map
+    candidates = load_category_classifier().classify(
+        news_text, top_k=CATEGORY_REFINEMENT_CANDIDATES, one_per_category=False
+    )
+    candidate_keywords = {}
+    for category, subcategory, _ in candidates:
+        candidate_keywords.setdefault(category, []).append(subcategory)
     
+    categories = refine_categories_with_llm(news_text, candidate_keywords)
+    return categories or [(category, subcategory) for category, subcategory, _ in candidates[:CATEGORY_TOP_K]]
+
+@st.cache_resource
+def load_retriever():
+    # Built once per process from the local corpus; without one the app falls back to the graph
     try:
-        with driver.session() as session:
-            # Process only the first subcategory with top 10 highest score articles
-            if categories and len(categories) > 0:
-                first_category, first_subcategory = categories[0]
-                query = """
-                MATCH (a:Article)-[r:BELONGS_TO]->(sc:Subcategory)
-                WHERE toLower(sc.name) = toLower($subcategory)
-                RETURN a.article_id AS article_id, a.heading AS heading, a.url AS url, 
-                       a.full_text AS full_text, r.score AS score, a.last_updated AS last_updated
-                ORDER BY r.score DESC
-                LIMIT 10
-                """
-                result = session.run(query, subcategory=first_subcategory)
-                for record in result:
-                    article_data = {
-                        "article_id": record["article_id"],
-                        "heading": record["heading"],
-                        "url": record["url"],
-                        "full_text": record["full_text"],
-                        "score": record["score"],
-                        "last_updated": record["last_updated"]
-                    }
-                    articles.append(article_data)
-            
+        retriever = HybridRetriever()
+    except Exception as e:
+        print(f"Hybrid retriever unavailable: {str(e)}")
+        return None
+    return retriever if len(retriever) else None
+
+def fetch_all_articles_by_categories(categories):
+    try:
+        with get_driver().session() as session:
+            articles = fetch_articles_by_subcategories(session, [subcategory for _, subcategory in categories])
             return articles
     except Exception as e:
         st.error(f"Neo4j query error: {str(e)}")
         return []
 
+def load_full_texts(articles):
+    # Candidates only carry a preview; the full text is fetched for the articles actually shown
+    try:
+        fetched = get_article_cache().fetch(get_driver(), [article["article_id"] for article in articles],
+                                            fields=("article_id", "full_text"))
+        full_texts = {article["article_id"]: article["full_text"] for article in fetched}
+    except Exception as e:
+        print(f"Error loading full article text: {str(e)}")
+        return articles
+    for article in articles:
+        article["full_text"] = full_texts.get(article["article_id"]) or article["full_text"]
+    return articles
+
 def filter_relevant_articles(news_text, all_articles):
     articles_data = []
     
@@ -144,17 +205,11 @@ def filter_relevant_articles(news_text, all_articles):
     
     while retry_count < max_retries:
         try:
-            response = model.generate_content(prompt)
-            result_text = response.text
-            
-            if '```json' in result_text:
-                json_str = result_text.split('```json')[1].split('```')[0].strip()
-            elif '```' in result_text:
-                json_str = result_text.split('```')[1].split('```')[0].strip()
-            else:
-                json_str = result_text.strip()
-                
-            relevant_article_data = json.loads(json_str)
+            relevant_article_data = llm_cache.cached_call(
+                MODEL_NAME, "filter-articles-v1", prompt,
+                lambda: model.generate_content(prompt).text,
+                parse_json_response
+            )
             
             relevant_ids = [item["article_id"] for item in relevant_article_data]
             relevant_articles = [article for article in all_articles if article["article_id"] in relevant_ids]
@@ -178,34 +233,13 @@ def filter_relevant_articles(news_text, all_articles):
                 return all_articles[:10]
 
 def fetch_articles_by_ids(article_ids):
-    articles = []
-    
     try:
-        with driver.session() as session:
-            for article_id in article_ids:
-                query = """
-                MATCH (a:Article {article_id: $article_id})
-                RETURN a.article_id AS article_id, a.heading AS heading, a.url AS url, 
-                       a.full_text AS full_text, a.last_updated AS last_updated
-                """
-                result = session.run(query, article_id=article_id)
-                record = result.single()
-                if record:
-                    article_data = {
-                        "article_id": record["article_id"],
-                        "heading": record["heading"],
-                        "url": record["url"],
-                        "full_text": record["full_text"],
-                        "last_updated": record["last_updated"]
-                    }
-                    articles.append(article_data)
-            
-            return articles
+        return get_article_cache().fetch(get_driver(), article_ids)
     except Exception as e:
         st.error(f"Neo4j query error: {str(e)}")
         return []
 
-def generate_financial_report(news_text, relevant_articles):
+def stream_financial_report(news_text, relevant_articles):
     formatted_articles = []
     for i, article in enumerate(relevant_articles[:10]):
         date = article.get("last_updated", "Unknown date")
@@ -282,10 +316,21 @@ def generate_financial_report(news_text, relevant_articles):
     backoff_time = 2
     
     while retry_count < max_retries:
+        emitted = False
         try:
-            response = model.generate_content(prompt)
-            return response.text
+            for chunk in llm_cache.cached_stream(
+                MODEL_NAME, "financial-report-v1", prompt,
+                lambda: (chunk.text for chunk in model.generate_content(prompt, stream=True))
+            ):
+                emitted = True
+                yield chunk
+            return
         except Exception as e:
+            # Once text is on screen a retry would repeat it, so a broken stream is only reported
+            if emitted:
+                print(f"Financial report stream interrupted: {str(e)}")
+                yield "\n\n*The report was cut short. Please try again for the complete analysis.*"
+                return
             retry_count += 1
             if retry_count < max_retries:
                 import time
@@ -294,7 +339,13 @@ def generate_financial_report(news_text, relevant_articles):
                 continue
             else:
                 print(f"Error generating financial report after {max_retries} attempts: {str(e)}")
-                return "# FINANCIAL INTELLIGENCE REPORT\n\n## Notice\n\nWe're currently experiencing high demand on our analysis systems. Our team is working to generate your financial intelligence report as soon as possible.\n\nIn the meantime, please review the historical precedent articles below, which contain valuable insights related to your query.\n\nThank you for your patience."
+                yield REPORT_FALLBACK
+
+def render_financial_report(news_text, relevant_articles):
+    st.header("🔍 Financial Intelligence Report")
+    timings = {}
+    st.write_stream(timed_stream(stream_financial_report(news_text, relevant_articles), "Financial report", timings))
+    st.caption(f"First words after {timings['first_token']:.1f}s, full report after {timings['total']:.1f}s")
 
 st.set_page_config(page_title="Financial News Flashback", layout="wide")
 st.title("📊 Financial News Flashback")
@@ -302,12 +353,17 @@ st.subheader("Historical Market Pattern Recognition System")
 
 news_text = st.text_area("Paste breaking financial news article:", height=200)
 
-def process_regular_news(news_text, categories):
-    if categories:
-        all_articles = fetch_all_articles_by_categories(categories)
+def process_regular_news(news_text):
+    retriever = load_retriever()
+    if retriever is not None:
+        all_articles = retriever.search(news_text, k=RETRIEVAL_TOP_K)
+    else:
+        # Categories only drive the Neo4j lookup, so the retriever path skips selecting them
+        categories = get_relevant_categories(news_text)
+        all_articles = fetch_all_articles_by_categories(categories) if categories else []
     
     if not all_articles:
-        st.info("No articles found for the selected categories. You might want to try a different news article.")
+        st.info("No related historical articles found. You might want to try a different news article.")
         return
     
     with st.spinner("Analyzing historical patterns and relevance..."):
@@ -317,14 +373,14 @@ def process_regular_news(news_text, categories):
         st.info("No historically relevant articles found. Try a different news article with more specific financial details.")
         return
     
-    with st.spinner("Generating financial intelligence report..."):
-        try:
-            report = generate_financial_report(news_text, relevant_articles)
-            st.header("🔍 Financial Intelligence Report")
-            st.markdown(report)
-        except Exception as e:
-            print(f"Error generating financial report: {str(e)}")
-            st.info("Unable to generate the financial report at this time. You can still view the relevant historical articles below.")
+    relevant_articles = load_full_texts(relevant_articles)
+    
+    # No spinner here: the streamed text is the progress indicator
+    try:
+        render_financial_report(news_text, relevant_articles)
+    except Exception as e:
+        print(f"Error generating financial report: {str(e)}")
+        st.info("Unable to generate the financial report at this time. You can still view the relevant historical articles below.")
     
     st.header("📚 Historical Precedent Articles")
     for i, article in enumerate(relevant_articles):
@@ -356,16 +412,14 @@ if st.button("Generate Financial Intelligence Report") and news_text:
                     if isinstance(article_data, list) and all(isinstance(item, dict) and "article_id" in item and "reasoning" in item for item in article_data):
                         relevant_articles = process_article_ids_with_reasoning(article_data)
                     else:
-                        categories = get_relevant_categories(news_text)
-                        process_regular_news(news_text, categories)
+                        process_regular_news(news_text)
                 except json.JSONDecodeError:
-                    categories = get_relevant_categories(news_text)
-                    process_regular_news(news_text, categories)
+                    process_regular_news(news_text)
             else:
-                categories = get_relevant_categories(news_text)
-                process_regular_news(news_text, categories)
+                process_regular_news(news_text)
         except Exception as e:
             print(f"Error processing input: {str(e)}")
             st.info("We're experiencing some technical difficulties. Please try again with a different news article or check back later.")
 
-driver.close()
\ No newline at end of file
+st.sidebar.caption(f"LLM cache: {llm_cache.summary()}")
+st.sidebar.caption(f"Article cache: {get_article_cache().stats}")
@@ -2,9 +2,19 @@ import os
 import streamlit as st
 import openai
 from dotenv import load_dotenv
-from neo4j import GraphDatabase
 import json
-from config import CATEGORY_KEYWORDS
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from config import CATEGORY_KEYWORDS, LLM_CATEGORY_REFINEMENT, CATEGORY_REFINEMENT_CANDIDATES, CATEGORY_TOP_K, RETRIEVAL_TOP_K
+from config import LLM_PANEL_TIMEOUT, LLM_REPORT_TIMEOUT, FILTER_PROMPT_TOKEN_BUDGET, FILTER_MAX_SHARDS
+from category_classifier import CategoryClassifier
+from retrieval import HybridRetriever
+from graph_queries import fetch_articles_by_subcategories, ArticleCache
+from graph_schema import ensure_schema
+from graph_connection import create_driver, is_healthy
+from llm_cache import get_llm_cache
+from streaming import timed_stream
+from llm_scoring import estimate_tokens
 
 load_dotenv()
 
@@ -14,10 +24,95 @@ NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 
 openai.api_key = OPENAI_API_KEY
+MODEL_NAME = "gpt-4-turbo"
+llm_cache = get_llm_cache()
+MARKET_IMPACT_FALLBACK = {
+    "historical_event": "Unable to determine comparable event",
+    "market_index": "S&P 500",
+    "impact_1d": 0,
+    "impact_1w": 0,
+    "impact_1m": 0
+}
+REPORT_FALLBACK = "# FINANCIAL INTELLIGENCE REPORT\n\n## Notice\n\nWe're currently experiencing high demand on our analysis systems. Our team is working to generate your financial intelligence report as soon as possible.\n\nIn the meantime, please review the historical precedent articles below, which contain valuable insights related to your query.\n\nThank you for your patience."
 
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+@st.cache_resource(validate=is_healthy)
+def get_driver():
+    # One pooled driver per server process, shared by every session and rerun
+    return create_driver(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
 
-def get_relevant_categories(news_text, CATEGORY_KEYWORDS=CATEGORY_KEYWORDS):
+@st.cache_resource
+def get_article_cache():
+    return ArticleCache()
+
+@st.cache_resource
+def bootstrap_graph_schema():
+    # Runs once per server process; a failure degrades query speed but must not take the app down
+    try:
+        ensure_schema(get_driver())
+    except Exception as e:
+        print(f"Neo4j schema bootstrap failed: {str(e)}")
+
+bootstrap_graph_schema()
+
+def chat_completion(system_prompt, prompt, timeout=None):
+    response = openai.chat.completions.create(
+        model=MODEL_NAME,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.2,
+        timeout=timeout
+    )
+    return response.choices[0].message.content
+
+def chat_completion_stream(system_prompt, prompt, timeout=None):
+    stream = openai.chat.completions.create(
+        model=MODEL_NAME,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.2,
+        stream=True,
+        timeout=timeout
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def parse_categories_response(response_text):
+    response_text = response_text.strip()
+    
+    if response_text.startswith("```") and response_text.endswith("```"):
+        clean_text = response_text.split("```")[1].strip()
+        if clean_text.startswith("json"):
+            clean_text = clean_text[4:].strip()
+    elif response_text.startswith("[") and response_text.endswith("]"):
+        clean_text = response_text
+    else:
+        lines = response_text.split('\n')
+        for line in lines:
+            line = line.strip()
+            if line.startswith("[") and line.endswith("]"):
+                clean_text = line
+                break
+        else:
+            clean_text = response_text
+    
+    return eval(clean_text)
+
+def parse_json_response(result_text):
+    if '```json' in result_text:
+        json_str = result_text.split('```json')[1].split('```')[0].strip()
+    elif '```' in result_text:
+        json_str = result_text.split('```')[1].split('```')[0].strip()
+    else:
+        json_str = result_text.strip()
+    
+    return json.loads(json_str)
+
+def refine_categories_with_llm(news_text, CATEGORY_KEYWORDS=CATEGORY_KEYWORDS):
     prompt = f"""
     Analyze this news article and select ONLY the most relevant categories and subcategories strictly from the Categories Keywords provided below:
     News: {news_text}
@@ -29,97 +124,107 @@ def get_relevant_categories(news_text, CATEGORY_KEYWORDS=CATEGORY_KEYWORDS):
     Only include categories that are highly relevant to the content. The length of the response array should STRICTLY below 3.
     """
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "You are a financial news categorization expert."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2
+        categories = llm_cache.cached_call(
+            MODEL_NAME, "categories-v1", prompt,
+            lambda: chat_completion("You are a financial news categorization expert.", prompt),
+            parse_categories_response
         )
-        response_text = response.choices[0].message.content.strip()
-        
-        if response_text.startswith("```") and response_text.endswith("```"):
-            clean_text = response_text.split("```")[1].strip()
-            if clean_text.startswith("json"):
-                clean_text = clean_text[4:].strip()
-        elif response_text.startswith("[") and response_text.endswith("]"):
-            clean_text = response_text
-        else:
-            lines = response_text.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line.startswith("[") and line.endswith("]"):
-                    clean_text = line
-                    break
-            else:
-                clean_text = response_text
-        
-        categories = eval(clean_text)
         st.write(f"Selected categories: {categories}")
         return categories
     except Exception as e:
         st.error(f"Error parsing categories: {str(e)}")
         return []
 
-def fetch_all_articles_by_categories(categories):
-    articles = []
+@st.cache_resource
+def load_category_classifier():
+    return CategoryClassifier()
+
+def get_relevant_categories(news_text):
+    if not LLM_CATEGORY_REFINEMENT:
+        candidates = load_category_classifier().classify(news_text)
+        categories = [(category, subcategory) for category, subcategory, _ in candidates]
+        st.write(f"Selected categories: {categories}")
+        return categories
+    
+    # The LLM only chooses among the classifier's shortlist instead of the full keyword map
+    candidates = load_category_classifier().classify(
+        news_text, top_k=CATEGORY_REFINEMENT_CANDIDATES, one_per_category=False
+    )
+    candidate_keywords = {}
+    for category, subcategory, _ in candidates:
+        candidate_keywords.setdefault(category, []).append(subcategory)
     
+    categories = refine_categories_with_llm(news_text, candidate_keywords)
+    return categories or [(category, subcategory) for category, subcategory, _ in candidates[:CATEGORY_TOP_K]]
+
+@st.cache_resource
+def load_retriever():
+    # Built once per process from the local corpus; without one the app falls back to the graph
     try:
-        with driver.session() as session:
-            for category, subcategory in categories:
-                query = """
-                MATCH (a:Article)-[r:BELONGS_TO]->(sc:Subcategory)
-                WHERE toLower(sc.name) = toLower($subcategory)
-                RETURN a.article_id AS article_id, a.heading AS heading, a.url AS url, 
-                       a.full_text AS full_text, r.score AS score, a.last_updated AS last_updated
-                """
-                result = session.run(query, subcategory=subcategory)
-                for record in result:
-                    article_data = {
-                        "article_id": record["article_id"],
-                        "heading": record["heading"],
-                        "url": record["url"],
-                        "full_text": record["full_text"],
-                        "score": record["score"],
-                        "last_updated": record["last_updated"]
-                    }
-                    articles.append(article_data)
-                
-            st.write(f"Found {len(articles)} total articles across all categories")
+        retriever = HybridRetriever()
+    except Exception as e:
+        print(f"Hybrid retriever unavailable: {str(e)}")
+        return None
+    return retriever if len(retriever) else None
+
+def fetch_all_articles_by_categories(categories):
+    try:
+        with get_driver().session() as session:
+            articles = fetch_articles_by_subcategories(session, [subcategory for _, subcategory in categories])
+            st.write(f"Found {len(articles)} articles across {len(categories)} subcategories")
             return articles
     except Exception as e:
         st.error(f"Neo4j query error: {str(e)}")
         return []
 
-def filter_relevant_articles(news_text, all_articles):
-    articles_data = []
-    
-    for article in all_articles:
-        articles_data.append({
-            "article_id": article["article_id"],
+def load_full_texts(articles):
+    # Candidates only carry a preview; the full text is fetched for the articles actually shown
+    try:
+        fetched = get_article_cache().fetch(get_driver(), [article["article_id"] for article in articles],
+                                            fields=("article_id", "full_text"))
+        full_texts = {article["article_id"]: article["full_text"] for article in fetched}
+    except Exception as e:
+        print(f"Error loading full article text: {str(e)}")
+        return articles
+    for article in articles:
+        article["full_text"] = full_texts.get(article["article_id"]) or article["full_text"]
+    return articles
+
+def pack_candidate_shards(all_articles, token_budget=FILTER_PROMPT_TOKEN_BUDGET, max_shards=FILTER_MAX_SHARDS):
+    # Candidates arrive best-first from retrieval; each shard is filled in that order up to the budget
+    # and whatever does not fit in max_shards is the lowest-ranked tail, which is dropped
+    shards = [[]]
+    used = 0
+    for position, article in enumerate(all_articles):
+        entry = json.dumps({
+            "id": str(position),
             "heading": article["heading"],
-            "url": article["url"],
             "preview": article["full_text"][:200] if article["full_text"] else "No content available"
-        })
-    
-    prompt = f"""
+        }, separators=(",", ":"), ensure_ascii=False)
+        tokens = estimate_tokens(entry)
+        if shards[-1] and used + tokens > token_budget:
+            if len(shards) == max_shards:
+                break
+            shards.append([])
+            used = 0
+        shards[-1].append((position, entry))
+        used += tokens
+    return [shard for shard in shards if shard]
+
+def build_filter_prompt(news_text, shard):
+    return f"""
     ACT as a senior financial analyst with expertise in market pattern recognition and historical comparison.
     
     1. ANALYZE this breaking financial news thoroughly:
     {news_text}
     
-    2. From these historical articles, IDENTIFY ONLY those that are financial news and DIRECTLY RELEVANT to the breaking news and STRONGLY CORRELATED to it:
-    {json.dumps(articles_data, indent=2)}
+    2. From these historical articles (one JSON object per line), IDENTIFY ONLY those that are financial news and DIRECTLY RELEVANT to the breaking news and STRONGLY CORRELATED to it:
+    {chr(10).join(entry for _, entry in shard)}
     
-    3. RETURN ONLY the relevant articles in this exact format - an array of objects with article_id and reasoning:
+    3. RETURN ONLY the relevant articles in this exact format - an array of objects with the article's id and reasoning:
     [
         {{
-            "article_id": "id1",
-            "reasoning": "Brief explanation of how this article relates to the breaking news"
-        }},
-        {{
-            "article_id": "id2",
+            "id": "3",
             "reasoning": "Brief explanation of how this article relates to the breaking news"
         }}
     ]
@@ -127,64 +232,52 @@ def filter_relevant_articles(news_text, all_articles):
     Articles should be sorted by relevance (most relevant first) and a max of 10 articles. 
     Only include articles with STRONG topical relevance. Prioritize quality over quantity.
     """
+
+def rank_shard(news_text, shard):
+    prompt = build_filter_prompt(news_text, shard)
+    started = time.perf_counter()
+    ranked = llm_cache.cached_call(
+        MODEL_NAME, "filter-articles-v2", prompt,
+        lambda: chat_completion("You are a financial analyst expert at finding historical market patterns.", prompt,
+                                timeout=LLM_PANEL_TIMEOUT),
+        parse_json_response
+    )
+    print(f"Ranked {len(shard)} candidates (~{estimate_tokens(prompt)} prompt tokens) in {time.perf_counter() - started:.2f}s")
+    positions = {str(position) for position, _ in shard}
+    return [int(item["id"]) for item in ranked if str(item.get("id")) in positions]
+
+def filter_relevant_articles(news_text, all_articles, max_results=10):
+    shards = pack_candidate_shards(all_articles)
+    if not shards:
+        return []
     
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "You are a financial analyst expert at finding historical market patterns."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2
-        )
-        result_text = response.choices[0].message.content
-        
-        if '```json' in result_text:
-            json_str = result_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in result_text:
-            json_str = result_text.split('```')[1].split('```')[0].strip()
-        else:
-            json_str = result_text.strip()
-            
-        relevant_article_data = json.loads(json_str)
-        
-        relevant_ids = [item["article_id"] for item in relevant_article_data]
-        relevant_articles = [article for article in all_articles if article["article_id"] in relevant_ids]
-        
-        sorted_articles = sorted(
-            relevant_articles, 
-            key=lambda x: relevant_ids.index(x["article_id"]) if x["article_id"] in relevant_ids else float('inf')
-        )
-        
-        return sorted_articles
-    except Exception as e:
-        st.error(f"Error filtering relevant articles: {str(e)}")
-        return all_articles[:10]
+    # Shards are ranked in parallel; errors are collected here because only this thread may call Streamlit
+    rankings = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        futures = [executor.submit(rank_shard, news_text, shard) for shard in shards]
+        for future in futures:
+            try:
+                rankings.append(future.result())
+            except Exception as e:
+                errors.append(str(e))
+    
+    if not rankings:
+        st.error(f"Error filtering relevant articles: {errors[0]}")
+        return all_articles[:max_results]
+    if errors:
+        print(f"{len(errors)} of {len(shards)} relevance shards failed: {errors}")
+    
+    # Merge by rank within each shard, breaking ties by the retrieval order
+    merged = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking):
+            merged.setdefault(position, (rank, position))
+    return [all_articles[position] for _, position in sorted(merged.values())[:max_results]]
 
 def fetch_articles_by_ids(article_ids):
-    articles = []
-    
     try:
-        with driver.session() as session:
-            for article_id in article_ids:
-                query = """
-                MATCH (a:Article {article_id: $article_id})
-                RETURN a.article_id AS article_id, a.heading AS heading, a.url AS url, 
-                       a.full_text AS full_text, a.last_updated AS last_updated
-                """
-                result = session.run(query, article_id=article_id)
-                record = result.single()
-                if record:
-                    article_data = {
-                        "article_id": record["article_id"],
-                        "heading": record["heading"],
-                        "url": record["url"],
-                        "full_text": record["full_text"],
-                        "last_updated": record["last_updated"]
-                    }
-                    articles.append(article_data)
-            
-            return articles
+        return get_article_cache().fetch(get_driver(), article_ids)
     except Exception as e:
         st.error(f"Neo4j query error: {str(e)}")
         return []
@@ -212,37 +305,15 @@ def generate_market_impact_data(news_text, relevant_articles):
     }}
     """
     
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "You are a financial analyst specializing in market impact assessment."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2
-        )
-        result_text = response.choices[0].message.content
-        
-        if '```json' in result_text:
-            json_str = result_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in result_text:
-            json_str = result_text.split('```')[1].split('```')[0].strip()
-        else:
-            json_str = result_text.strip()
-            
-        impact_data = json.loads(json_str)
-        return impact_data
-    except Exception as e:
-        st.error(f"Error generating market impact data: {str(e)}")
-        return {
-            "historical_event": "Unable to determine comparable event",
-            "market_index": "S&P 500",
-            "impact_1d": 0,
-            "impact_1w": 0,
-            "impact_1m": 0
-        }
-
-def generate_financial_report(news_text, relevant_articles):
+    # Runs on a worker thread, so errors are left to the caller to display
+    return llm_cache.cached_call(
+        MODEL_NAME, "market-impact-v1", prompt,
+        lambda: chat_completion("You are a financial analyst specializing in market impact assessment.", prompt,
+                                timeout=LLM_PANEL_TIMEOUT),
+        parse_json_response
+    )
+
+def stream_financial_report(news_text, relevant_articles):
     formatted_articles = []
     for i, article in enumerate(relevant_articles[:10]):
         date = article.get("last_updated", "Unknown date")
@@ -314,19 +385,98 @@ def generate_financial_report(news_text, relevant_articles):
     - Free of speculative language without factual basis
     """
     
+    emitted = False
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "You are a senior financial analyst at a top investment bank."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2
-        )
-        return response.choices[0].message.content
+        for chunk in llm_cache.cached_stream(
+            MODEL_NAME, "financial-report-v1", prompt,
+            lambda: chat_completion_stream("You are a senior financial analyst at a top investment bank.", prompt,
+                                           timeout=LLM_PANEL_TIMEOUT)
+        ):
+            emitted = True
+            yield chunk
     except Exception as e:
         st.error(f"Error generating financial report: {str(e)}")
-        return "# FINANCIAL INTELLIGENCE REPORT\n\n## Notice\n\nWe're currently experiencing high demand on our analysis systems. Our team is working to generate your financial intelligence report as soon as possible.\n\nIn the meantime, please review the historical precedent articles below, which contain valuable insights related to your query.\n\nThank you for your patience."
+        if emitted:
+            yield "\n\n*The report was cut short. Please try again for the complete analysis.*"
+        else:
+            yield REPORT_FALLBACK
+
+def render_market_impact(impact_data):
+    st.header("📈 Market Impact Projection")
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("1-Day Impact", f"{impact_data['impact_1d']*100:.2f}%")
+    with col2:
+        st.metric("1-Week Impact", f"{impact_data['impact_1w']*100:.2f}%")
+    with col3:
+        st.metric("1-Month Impact", f"{impact_data['impact_1m']*100:.2f}%")
+        
+    st.caption(f"Based on historical comparison to: {impact_data['historical_event']}")
+    st.caption(f"Reference index: {impact_data['market_index']}")
+
+def render_financial_report(chunks):
+    st.header("🔍 Financial Intelligence Report")
+    timings = {}
+    st.write_stream(timed_stream(chunks, "Financial report", timings))
+    st.caption(f"First words after {timings['first_token']:.1f}s, full report after {timings['total']:.1f}s")
+
+def render_analysis_panels(news_text, relevant_articles):
+    # The impact estimate runs on a worker thread while the report streams on the script thread,
+    # so the page waits for the slower of the two instead of their sum. Only the script thread
+    # touches Streamlit; it draws the impact panel between report chunks as soon as it is ready.
+    started = time.monotonic()
+    impact_panel = st.container()
+    with impact_panel:
+        impact_status = st.empty()
+        impact_status.caption("Estimating market impact...")
+    
+    executor = ThreadPoolExecutor(max_workers=1)
+    impact_future = executor.submit(generate_market_impact_data, news_text, relevant_articles)
+    impact_shown = False
+    
+    def show_impact(wait):
+        nonlocal impact_shown
+        if impact_shown or (not wait and not impact_future.done()):
+            return
+        impact_shown = True
+        error = None
+        try:
+            impact_data = impact_future.result(timeout=max(0, LLM_PANEL_TIMEOUT - (time.monotonic() - started)))
+            print(f"Market impact ready after {time.monotonic() - started:.2f}s")
+        except FuturesTimeoutError:
+            print(f"Market impact estimate timed out after {LLM_PANEL_TIMEOUT}s")
+            impact_data = MARKET_IMPACT_FALLBACK
+        except Exception as e:
+            error = f"Error generating market impact data: {str(e)}"
+            impact_data = MARKET_IMPACT_FALLBACK
+        with impact_panel:
+            impact_status.empty()
+            if error:
+                st.error(error)
+            try:
+                render_market_impact(impact_data)
+            except Exception as e:
+                print(f"Error displaying market impact: {str(e)}")
+    
+    def report_chunks():
+        for chunk in stream_financial_report(news_text, relevant_articles):
+            show_impact(wait=False)
+            yield chunk
+            if time.monotonic() - started > LLM_REPORT_TIMEOUT:
+                print(f"Financial report stopped after {LLM_REPORT_TIMEOUT}s")
+                yield "\n\n*The report took too long and was cut short. Please try again for the complete analysis.*"
+                return
+    
+    try:
+        render_financial_report(report_chunks())
+    except Exception as e:
+        print(f"Error generating financial report: {str(e)}")
+        st.info("Unable to generate the financial report at this time. You can still view the relevant historical articles below.")
+    finally:
+        show_impact(wait=True)
+        executor.shutdown(wait=False)
+    print(f"Analysis panels complete after {time.monotonic() - started:.2f}s")
 
 st.set_page_config(page_title="Financial News Flashback", layout="wide")
 st.title("📊 Financial News Flashback")
@@ -334,12 +484,17 @@ st.subheader("Historical Market Pattern Recognition System")
 
 news_text = st.text_area("Paste breaking financial news article:", height=200)
 
-def process_regular_news(news_text, categories):
-    if categories:
-        all_articles = fetch_all_articles_by_categories(categories)
+def process_regular_news(news_text):
+    retriever = load_retriever()
+    if retriever is not None:
+        all_articles = retriever.search(news_text, k=RETRIEVAL_TOP_K)
+    else:
+        # Categories only drive the Neo4j lookup, so the retriever path skips selecting them
+        categories = get_relevant_categories(news_text)
+        all_articles = fetch_all_articles_by_categories(categories) if categories else []
     
     if not all_articles:
-        st.info("No articles found for the selected categories. You might want to try a different news article.")
+        st.info("No related historical articles found. You might want to try a different news article.")
         return
     
     with st.spinner("Analyzing historical patterns and relevance..."):
@@ -349,33 +504,9 @@ def process_regular_news(news_text, categories):
         st.info("No historically relevant articles found. Try a different news article with more specific financial details.")
         return
     
-    with st.spinner("Generating market impact visualization..."):
-        try:
-            impact_data = generate_market_impact_data(news_text, relevant_articles)
-            
-            st.header("📈 Market Impact Projection")
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.metric("1-Day Impact", f"{impact_data['impact_1d']*100:.2f}%")
-            with col2:
-                st.metric("1-Week Impact", f"{impact_data['impact_1w']*100:.2f}%")
-            with col3:
-                st.metric("1-Month Impact", f"{impact_data['impact_1m']*100:.2f}%")
-                
-            st.caption(f"Based on historical comparison to: {impact_data['historical_event']}")
-            st.caption(f"Reference index: {impact_data['market_index']}")
-        except Exception as e:
-            print(f"Error displaying market impact: {str(e)}")
+    relevant_articles = load_full_texts(relevant_articles)
     
-    with st.spinner("Generating financial intelligence report..."):
-        try:
-            report = generate_financial_report(news_text, relevant_articles)
-            st.header("🔍 Financial Intelligence Report")
-            st.markdown(report)
-        except Exception as e:
-            print(f"Error generating financial report: {str(e)}")
-            st.info("Unable to generate the financial report at this time. You can still view the relevant historical articles below.")
+    render_analysis_panels(news_text, relevant_articles)
     
     st.header("📚 Historical Precedent Articles")
     for i, article in enumerate(relevant_articles):
@@ -407,33 +538,7 @@ if st.button("Generate Financial Intelligence Report") and news_text:
                         st.info("Processing provided article IDs with reasoning...")
                         relevant_articles = process_article_ids_with_reasoning(article_data)
                         
-                        with st.spinner("Generating market impact visualization..."):
-                            try:
-                                impact_data = generate_market_impact_data("Analysis of provided articles", relevant_articles)
-                                
-                                st.header("📈 Market Impact Projection")
-                                col1, col2, col3 = st.columns(3)
-                                
-                                with col1:
-                                    st.metric("1-Day Impact", f"{impact_data['impact_1d']*100:.2f}%")
-                                with col2:
-                                    st.metric("1-Week Impact", f"{impact_data['impact_1w']*100:.2f}%")
-                                with col3:
-                                    st.metric("1-Month Impact", f"{impact_data['impact_1m']*100:.2f}%")
-                                    
-                                st.caption(f"Based on historical comparison to: {impact_data['historical_event']}")
-                                st.caption(f"Reference index: {impact_data['market_index']}")
-                            except Exception as e:
-                                print(f"Error displaying market impact: {str(e)}")
-                        
-                        with st.spinner("Generating financial intelligence report..."):
-                            try:
-                                report = generate_financial_report("Analysis based on provided articles", relevant_articles)
-                                st.header("🔍 Financial Intelligence Report")
-                                st.markdown(report)
-                            except Exception as e:
-                                print(f"Error generating financial report: {str(e)}")
-                                st.info("Unable to generate the financial report at this time.")
+                        render_analysis_panels("Analysis based on provided articles", relevant_articles)
                         
                         st.header("📚 Provided Articles with Reasoning")
                         for i, article in enumerate(relevant_articles):
@@ -444,16 +549,14 @@ if st.button("Generate Financial Intelligence Report") and news_text:
                                 st.write("**Content Preview:**")
                                 st.write(article['full_text'][:500] + "..." if len(article['full_text']) > 500 else article['full_text'])
                     else:
-                        categories = get_relevant_categories(news_text)
-                        process_regular_news(news_text, categories)
+                        process_regular_news(news_text)
                 except json.JSONDecodeError:
-                    categories = get_relevant_categories(news_text)
-                    process_regular_news(news_text, categories)
+                    process_regular_news(news_text)
             else:
-                categories = get_relevant_categories(news_text)
-                process_regular_news(news_text, categories)
+                process_regular_news(news_text)
         except Exception as e:
             print(f"Error processing input: {str(e)}")
             st.info("We're experiencing some technical difficulties. Please try again with a different news article or check back later.")
 
-driver.close()
\ No newline at end of file
+st.sidebar.caption(f"LLM cache: {llm_cache.summary()}")
+st.sidebar.caption(f"Article cache: {get_article_cache().stats}")
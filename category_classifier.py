@@ -0,0 +1,54 @@
+import re
+import time
+
+import numpy as np
+
+from embeddings import embed_texts
+from config import CATEGORY_KEYWORDS, CATEGORY_EMBEDDING_MODEL, CATEGORY_MIN_SCORE, CATEGORY_TOP_K
+
+def split_passages(text, max_words=60):
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
+    passages = []
+    current = []
+    for sentence in sentences:
+        current.append(sentence)
+        if sum(len(s.split()) for s in current) >= max_words:
+            passages.append(" ".join(current))
+            current = []
+    if current:
+        passages.append(" ".join(current))
+    return passages or [text]
+
+class CategoryClassifier:
+    def __init__(self, category_keywords=CATEGORY_KEYWORDS, model_name=CATEGORY_EMBEDDING_MODEL):
+        self.model_name = model_name
+        self.pairs = [
+            (category, keyword)
+            for category, keywords in category_keywords.items()
+            for keyword in dict.fromkeys(keywords)
+        ]
+        # Every (category, keyword) pair is embedded once, with the category name for context
+        labels = [f"{category}: {keyword}" for category, keyword in self.pairs]
+        self.label_embeddings = embed_texts(labels, model_name)
+
+    def score(self, news_text):
+        passages = split_passages(news_text)
+        passage_embeddings = embed_texts(passages, self.model_name)
+        # Cosine similarity of every passage against every label; a label scores its best passage
+        return (passage_embeddings @ self.label_embeddings.T).max(axis=0)
+
+    def classify(self, news_text, top_k=CATEGORY_TOP_K, min_score=CATEGORY_MIN_SCORE, one_per_category=True):
+        started = time.perf_counter()
+        scores = self.score(news_text)
+        results = []
+        seen_categories = set()
+        for index in np.argsort(-scores):
+            if scores[index] < min_score or len(results) >= top_k:
+                break
+            category, keyword = self.pairs[index]
+            if one_per_category and category in seen_categories:
+                continue
+            seen_categories.add(category)
+            results.append((category, keyword, float(scores[index])))
+        print(f"Classified categories in {1000 * (time.perf_counter() - started):.1f}ms: {results}")
+        return results
@@ -1,11 +1,69 @@
 from datetime import datetime
 
 OUTPUT_DIR = "FinancialNewsData"
+STORAGE_FORMAT = "parquet"
+PROCESSING_JOURNAL_PATH = "processing_journal.db"
+CRAWL_STATE_PATH = f"{OUTPUT_DIR}/crawl_state.db"
+HTTP_CACHE_DIR = f"{OUTPUT_DIR}/http_cache"
+HTTP_CACHE_MAX_BYTES = 2 * 1024 ** 3
 BASE_URL = 'https://www.theguardian.com/business/stock-markets'
 BUSINESS_URL = 'https://www.theguardian.com/uk/business'
 START_DATE = datetime(2023, 1, 1)
 END_DATE = datetime(2025, 5, 15)
 SENTIMENT_THRESHOLD = 0.4
+SENTIMENT_BATCH_SIZE = 16
+SENTIMENT_WINDOW_SIZE = 512
+SENTIMENT_WINDOW_STRIDE = 384
+MAX_SENTIMENT_WINDOWS = 8
+CRAWL_MAX_CONCURRENCY = 16
+CRAWL_PER_HOST_CONCURRENCY = 4
+CRAWL_REQUESTS_PER_SECOND = 2.0
+CRAWL_BURST = 4
+CRAWL_DAYS_IN_FLIGHT = 4
+CRAWL_QUEUE_SIZE = 8
+PIPELINE_QUEUE_SIZE = 256
+PIPELINE_DISCOVERY_WORKERS = 4
+PIPELINE_DOWNLOAD_WORKERS = 16
+PIPELINE_MODEL_PROCESSES = 2
+PIPELINE_REPORT_INTERVAL = 30
+LLM_CONCURRENCY = 8
+LLM_REQUESTS_PER_MINUTE = 60
+LLM_TOKENS_PER_MINUTE = 1000000
+LLM_MAX_RETRIES = 5
+LLM_CACHE_PATH = "llm_cache.db"
+LLM_CACHE_MAX_BYTES = 512 * 1024 ** 2
+LLM_CACHE_TTL = 30 * 24 * 3600
+LLM_CACHE_MEMORY_ITEMS = 512
+LLM_CACHE_ACCESS_FLUSH = 256
+CATEGORY_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CATEGORY_MIN_SCORE = 0.3
+CATEGORY_TOP_K = 2
+LLM_CATEGORY_REFINEMENT = False
+CATEGORY_REFINEMENT_CANDIDATES = 8
+VECTOR_INDEX_DIR = f"{OUTPUT_DIR}/vector_index"
+IVF_MIN_VECTORS = 20000
+IVF_NPROBE = 8
+BM25_K1 = 1.2
+BM25_B = 0.75
+HEADLINE_BOOST = 3
+RRF_K = 60
+RETRIEVAL_CANDIDATES = 100
+RETRIEVAL_TOP_K = 20
+NEO4J_INDEX_TIMEOUT = 300
+NEO4J_EXPORT_BATCH_SIZE = 1000
+NEO4J_EXPORT_WORKERS = 4
+NEO4J_MAX_POOL_SIZE = 20
+NEO4J_CONNECTION_LIFETIME = 1800
+NEO4J_ACQUISITION_TIMEOUT = 10
+NEO4J_LIVENESS_CHECK_TIMEOUT = 30
+NEO4J_WARM_CONNECTIONS = 2
+NEO4J_HEALTH_CHECK_INTERVAL = 60
+ARTICLE_CACHE_ITEMS = 2048
+ARTICLE_CACHE_TTL = 3600
+LLM_PANEL_TIMEOUT = 60
+LLM_REPORT_TIMEOUT = 180
+FILTER_PROMPT_TOKEN_BUDGET = 4000
+FILTER_MAX_SHARDS = 4
 FINANCIAL_KEYWORDS = [
     'stock', 'stocks', 'market', 'markets', 'shares', 'equity', 'equities', 'securities',
     'trading', 'trader', 'traders', 'investor', 'investors', 'investment', 'investments',
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from config import CRAWL_STATE_PATH
+
+KEPT = "kept"
+NON_FINANCIAL = "non_financial"
+BELOW_THRESHOLD = "below_threshold"
+NO_TEXT = "no_text"
+FETCH_FAILED = "fetch_failed"
+
+def _date_key(date):
+    return date if isinstance(date, str) else date.strftime("%Y-%m-%d")
+
+class CrawlState:
+    def __init__(self, path=CRAWL_STATE_PATH):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS completed_dates (
+                date TEXT PRIMARY KEY,
+                completed_at TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scored_urls (
+                url TEXT PRIMARY KEY,
+                outcome TEXT NOT NULL,
+                date TEXT,
+                scored_at TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+        # Held in memory so every skip check during the crawl is a dict lookup
+        self.completed_dates = {row[0] for row in self.conn.execute("SELECT date FROM completed_dates")}
+        self.url_outcomes = dict(self.conn.execute("SELECT url, outcome FROM scored_urls"))
+
+    def close(self):
+        self.conn.close()
+
+    def is_date_completed(self, date):
+        return _date_key(date) in self.completed_dates
+
+    def pending_dates(self, start_date, end_date, resume=False):
+        # Without resume every day from start_date is crawled again. With it, completed days are
+        # skipped; days finish out of order, so an incomplete day before a completed one is still pending
+        skipped = 0
+        announced = not resume
+        current_date = start_date
+        while current_date <= end_date:
+            if resume and self.is_date_completed(current_date):
+                skipped += 1
+            else:
+                if not announced:
+                    print(f"Resuming from {current_date.strftime('%Y-%m-%d')} ({skipped} completed days before it)")
+                    announced = True
+                yield current_date
+            current_date += timedelta(days=1)
+        if resume:
+            print(f"Skipped {skipped} completed days between {start_date.strftime('%Y-%m-%d')} and {end_date.strftime('%Y-%m-%d')}")
+
+    def mark_date_completed(self, date):
+        date = _date_key(date)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO completed_dates (date, completed_at) VALUES (?, ?)",
+                (date, datetime.now().isoformat())
+            )
+            self.conn.commit()
+            self.completed_dates.add(date)
+
+    def is_url_scored(self, url):
+        return url in self.url_outcomes
+
+    def record_urls(self, urls, outcome, date=None):
+        urls = list(urls)
+        if not urls:
+            return
+        date = _date_key(date) if date is not None else None
+        scored_at = datetime.now().isoformat()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO scored_urls (url, outcome, date, scored_at) VALUES (?, ?, ?, ?)",
+                [(url, outcome, date, scored_at) for url in urls]
+            )
+            self.conn.commit()
+            for url in urls:
+                self.url_outcomes[url] = outcome
+
+    def summary(self):
+        counts = {}
+        for outcome in self.url_outcomes.values():
+            counts[outcome] = counts.get(outcome, 0) + 1
+        return {"completed_dates": len(self.completed_dates), "urls": counts}
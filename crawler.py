@@ -0,0 +1,174 @@
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from newspaper import Article
+from requests.adapters import HTTPAdapter
+
+from rate_limit import TokenBucket
+from http_cache import CacheMiss
+from config import (
+    BASE_URL, BUSINESS_URL, CRAWL_MAX_CONCURRENCY, CRAWL_PER_HOST_CONCURRENCY,
+    CRAWL_REQUESTS_PER_SECOND, CRAWL_BURST, CRAWL_DAYS_IN_FLIGHT, CRAWL_QUEUE_SIZE
+)
+
+# Throttling and timeout statuses that are worth another attempt on a later run
+TRANSIENT_STATUS_CODES = {408, 425, 429}
+
+def is_transient_error(error):
+    # Network errors, timeouts, 5xx and throttling may clear up; other 4xx responses and pages
+    # that cannot be parsed fail the same way every time, so retrying them would never finish the day
+    if isinstance(error, CacheMiss):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status >= 500 or status in TRANSIENT_STATUS_CODES
+    return isinstance(error, requests.RequestException)
+
+def guardian_section_url(section_url, date=None):
+    if date:
+        return f"{section_url}/{date.strftime('%Y/%b/%d').lower()}"
+    return section_url
+
+def parse_guardian_links(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    articles = soup.find_all('a', class_='u-faux-block-link__overlay')
+    return [a['href'] for a in articles if a.has_attr('href')]
+
+def parse_article(url, html):
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+    return {
+        'text': article.text.strip(),
+        'title': article.title,
+        'publish_date': article.publish_date
+    }
+
+class Crawler:
+    def __init__(self, max_concurrency=CRAWL_MAX_CONCURRENCY, per_host_concurrency=CRAWL_PER_HOST_CONCURRENCY,
+                 requests_per_second=CRAWL_REQUESTS_PER_SECOND, burst=CRAWL_BURST,
+                 days_in_flight=CRAWL_DAYS_IN_FLIGHT, queue_size=CRAWL_QUEUE_SIZE, timeout=10, skip_url=None, cache=None):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # The fetch pool size is the global concurrency limit
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.per_host_concurrency = per_host_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.days_in_flight = days_in_flight
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.skip_url = skip_url
+        self.cache = cache
+
+        self.host_limits = defaultdict(lambda: threading.BoundedSemaphore(self.per_host_concurrency))
+        self.rate_limiters = defaultdict(lambda: TokenBucket(self.requests_per_second, self.burst))
+        self.host_lock = threading.Lock()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+        if self.cache is not None:
+            print(f"HTTP cache: {self.cache.stats()}")
+            if self.cache.offline and self.cache.misses:
+                print(f"{self.cache.misses} pages were not cached; their days were left pending for an online run")
+            self.cache.close()
+
+    def _host_controls(self, url):
+        host = urlparse(url).netloc
+        with self.host_lock:
+            return self.host_limits[host], self.rate_limiters[host]
+
+    def fetch(self, url):
+        # Offline reads come straight from disk and skip the politeness limits
+        if self.cache is not None and self.cache.offline:
+            return self.cache.get(self.session, url, self.timeout)
+
+        host_limit, rate_limiter = self._host_controls(url)
+        with host_limit:
+            rate_limiter.acquire()
+            if self.cache is not None:
+                return self.cache.get(self.session, url, self.timeout)
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.text
+
+    # Both fetchers return None after a transient failure (including an offline cache miss), so the
+    # day is retried later. A permanent failure is final: a section yields no links, and an article
+    # comes back without text and with an 'error' so callers can record it
+    def fetch_links(self, date=None, section_url=BASE_URL):
+        url = guardian_section_url(section_url, date)
+        try:
+            return parse_guardian_links(self.fetch(url))
+        except CacheMiss:
+            return None
+        except Exception as e:
+            print(f"Error fetching links from {url}: {e}")
+            return None if is_transient_error(e) else []
+
+    def fetch_article(self, url):
+        try:
+            return parse_article(url, self.fetch(url))
+        except CacheMiss:
+            return None
+        except Exception as e:
+            print(f"Error scraping {url}: {e}")
+            if is_transient_error(e):
+                return None
+            return {'text': "", 'title': "", 'publish_date': None, 'error': str(e)}
+
+    def crawl_day(self, date, section_urls=(BASE_URL, BUSINESS_URL)):
+        # Returns (date, articles, complete); complete is False if any fetch failed,
+        # and failed articles are left out so they are retried on the next run
+        link_futures = [self.executor.submit(self.fetch_links, date, section_url) for section_url in section_urls]
+        section_links = [future.result() for future in link_futures]
+        complete = all(links is not None for links in section_links)
+        all_links = list(dict.fromkeys(link for links in section_links if links for link in links))
+        if self.skip_url is not None:
+            all_links = [link for link in all_links if not self.skip_url(link)]
+        print(f"Found {len(all_links)} total articles to process for {date.strftime('%Y-%m-%d')}")
+
+        article_futures = [(link, self.executor.submit(self.fetch_article, link)) for link in all_links]
+        articles = [(link, future.result()) for link, future in article_futures]
+        complete = complete and all(article_data is not None for _, article_data in articles)
+        return date, [(link, article_data) for link, article_data in articles if article_data is not None], complete
+
+    def _produce(self, dates, section_urls, output):
+        try:
+            with ThreadPoolExecutor(max_workers=self.days_in_flight) as day_executor:
+                pending = set()
+                for date in dates:
+                    if len(pending) >= self.days_in_flight:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            output.put(future.result())
+                    pending.add(day_executor.submit(self.crawl_day, date, section_urls))
+                for future in pending:
+                    output.put(future.result())
+        except Exception as e:
+            print(f"Error crawling: {e}")
+        finally:
+            output.put(None)
+
+    def crawl(self, dates, section_urls=(BASE_URL, BUSINESS_URL)):
+        # Days are yielded as they complete; the bounded queue holds back the
+        # producer while the consumer is busy scoring
+        output = queue.Queue(maxsize=self.queue_size)
+        producer = threading.Thread(target=self._produce, args=(dates, section_urls, output), daemon=True)
+        producer.start()
+
+        while True:
+            item = output.get()
+            if item is None:
+                break
+            yield item
+
+        producer.join()
@@ -1,175 +1,313 @@
-import requests
-from bs4 import BeautifulSoup
-import csv
-from datetime import datetime, timedelta
-from newspaper import Article
-import time
-import os
+import numpy as np
 import torch
 import scipy.special
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import hashlib
+import re
+from collections import Counter
 from keybert import KeyBERT
+from keybert.backend import BaseEmbedder
 from config import *
+from storage import save_articles
+from crawl_state import CrawlState, KEPT, NON_FINANCIAL, BELOW_THRESHOLD, NO_TEXT, FETCH_FAILED
+from http_cache import HttpCache
+from crawler import Crawler
 
 tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
 model_finbert = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
-kw_model = KeyBERT(model="ProsusAI/finbert")
+model_finbert.eval()
 
-def is_financial_content(text, url, threshold=2):
-    financial_sections = ['business', 'money', 'finance', 'stock', 'market', 'invest']
-    url_score = sum(1 for section in financial_sections if section in url.lower())
-    keyword_count = sum(1 for keyword in FINANCIAL_KEYWORDS if keyword in text.lower())
+KEYWORD_CACHE_SIZE = 8
+
+# Per-article encoder output and keyword results, keyed by text hash
+_encoding_cache = {}
+_keyword_cache = {}
+_phrase_embedding_cache = {}
+
+def _mean_pool(hidden_states, attention_mask):
+    mask = attention_mask.unsqueeze(-1).to(hidden_states.dtype)
+    return (hidden_states * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+
+class FinBertEmbedder(BaseEmbedder):
+    # Serves KeyBERT from the classifier's own encoder so the weights are loaded once
+    def embed(self, documents, verbose=False):
+        missing = [doc for doc in dict.fromkeys(documents) if doc not in _phrase_embedding_cache]
+        for start in range(0, len(missing), 64):
+            batch = missing[start:start + 64]
+            with torch.no_grad():
+                inputs = tokenizer(batch, return_tensors="pt", padding="longest", truncation=True, max_length=64)
+                hidden_states = model_finbert.bert(**inputs).last_hidden_state
+                embeddings = _mean_pool(hidden_states, inputs["attention_mask"]).numpy()
+            _phrase_embedding_cache.update(zip(batch, embeddings))
+        return np.array([_phrase_embedding_cache[doc] for doc in documents])
+
+kw_model = KeyBERT(model=FinBertEmbedder())
+
+def _text_key(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def clear_article_caches():
+    _encoding_cache.clear()
+    _keyword_cache.clear()
+    if len(_phrase_embedding_cache) > 50000:
+        _phrase_embedding_cache.clear()
+
+FINANCIAL_SECTIONS = ['business', 'money', 'finance', 'stock', 'market', 'invest']
+
+# Longest-first alternation inside a lookahead finds the longest keyword starting at
+# every position in one scan; shorter keywords sharing that start are its prefixes
+_financial_keywords = sorted(set(FINANCIAL_KEYWORDS), key=len, reverse=True)
+FINANCIAL_KEYWORD_PATTERN = re.compile("(?=(" + "|".join(re.escape(kw) for kw in _financial_keywords) + "))")
+FINANCIAL_KEYWORD_PREFIXES = {
+    kw: [other for other in _financial_keywords if kw.startswith(other)]
+    for kw in _financial_keywords
+}
+
+filter_stage_counts = Counter()
+
+def count_financial_keywords(lowered_text, stop_at=None):
+    found = set()
+    for match in FINANCIAL_KEYWORD_PATTERN.finditer(lowered_text):
+        found.update(FINANCIAL_KEYWORD_PREFIXES[match.group(1)])
+        if stop_at is not None and len(found) >= stop_at:
+            break
+    return len(found)
+
+def classify_financial_content(text, url, threshold=2):
+    url_score = sum(1 for section in FINANCIAL_SECTIONS if section in url.lower())
+    if url_score >= threshold:
+        return True, "url", url_score
+    
+    keyword_count = count_financial_keywords(text.lower(), stop_at=threshold - url_score)
+    if url_score + keyword_count >= threshold:
+        return True, "keywords", url_score + keyword_count
+    
+    # Only borderline articles pay for the neural stage
     extracted_keywords = extract_keywords(text, num_keywords=8)
-    extracted_keyword_matches = sum(1 for keyword in extracted_keywords if any(
-        fin_keyword in keyword.lower() for fin_keyword in FINANCIAL_KEYWORDS))
+    extracted_keyword_matches = sum(1 for keyword in extracted_keywords if count_financial_keywords(keyword.lower(), stop_at=1))
     
     total_score = url_score + keyword_count + extracted_keyword_matches
     print(f"Financial content score: {total_score} (URL: {url_score}, Keywords: {keyword_count}, Extracted: {extracted_keyword_matches})")
     
-    return total_score >= threshold
+    return total_score >= threshold, "keybert", total_score
 
-def fetch_guardian_links(date=None, section_url=BASE_URL):
-    try:
-        url = section_url
-        if date:
-            formatted_date = date.strftime("%Y/%b/%d").lower()
-            url = f"{section_url}/{formatted_date}"
-        
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        articles = soup.find_all('a', class_='u-faux-block-link__overlay')
-        return [a['href'] for a in articles if a.has_attr('href')]
-    except Exception as e:
-        print(f"Error fetching links from {url}: {e}")
-        return []
+def is_financial_content(text, url, threshold=2):
+    is_financial, stage, _ = classify_financial_content(text, url, threshold)
+    filter_stage_counts[stage] += 1
+    return is_financial
 
-def scrape_full_article(url):
-    try:
-        article = Article(url)
-        article.download()
-        article.parse()
-        return {
-            'text': article.text.strip(),
-            'title': article.title,
-            'publish_date': article.publish_date
-        }
-    except Exception as e:
-        print(f"Error scraping {url}: {e}")
-        return {'text': "", 'title': "", 'publish_date': None}
+def analyze_sentiment(text, chunked=True):
+    return analyze_sentiment_batch([text], chunked=chunked)[0]
 
-def analyze_sentiment(text):
-    try:
-        tokenizer_kwargs = {"padding": True, "truncation": True, "max_length": 512}
-        with torch.no_grad():
-            input_sequence = tokenizer(text, return_tensors="pt", **tokenizer_kwargs)
-            logits = model_finbert(**input_sequence).logits
-            scores = {
-                k: v
-                for k, v in zip(
-                    model_finbert.config.id2label.values(),
-                    scipy.special.softmax(logits.numpy().squeeze()),
-                )
-            }
+def split_into_windows(token_ids, max_windows=MAX_SENTIMENT_WINDOWS):
+    # Leave room for the [CLS] and [SEP] tokens added to every window
+    window_size = SENTIMENT_WINDOW_SIZE - 2
+    stride = min(SENTIMENT_WINDOW_STRIDE, window_size)
+    windows = []
+    
+    for start in range(0, max(len(token_ids), 1), stride):
+        windows.append(token_ids[start:start + window_size])
+        if start + window_size >= len(token_ids) or len(windows) >= max_windows:
+            break
+    
+    return windows
+
+def encode_articles(texts, batch_size=SENTIMENT_BATCH_SIZE, chunked=True):
+    # One encoder pass per article yields both the sentiment probabilities and the
+    # document embedding used by KeyBERT; results are cached for later callers
+    max_windows = MAX_SENTIMENT_WINDOWS if chunked else 1
+    keys = [(_text_key(text), max_windows) for text in texts]
+    
+    # Every window of every uncached article goes into one flat list so they share batches
+    windows = []
+    owners = []
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key in _encoding_cache or key in pending:
+            continue
+        try:
+            token_ids = tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"]
+        except Exception as e:
+            print(f"Error tokenizing text for sentiment: {e}")
+            continue
+        pending[key] = len(pending)
+        for window in split_into_windows(token_ids, max_windows):
+            windows.append(tokenizer.build_inputs_with_special_tokens(window))
+            owners.append(pending[key])
+    
+    if windows:
+        num_labels = model_finbert.config.num_labels
+        probabilities = np.zeros((len(windows), num_labels))
+        embeddings = np.zeros((len(windows), model_finbert.config.hidden_size))
+        scored = np.zeros(len(windows), dtype=bool)
+        # Sort by length so each batch pads to a similar size
+        order = sorted(range(len(windows)), key=lambda w: len(windows[w]))
+        
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start:start + batch_size]
+            try:
+                with torch.no_grad():
+                    input_sequence = tokenizer.pad(
+                        {"input_ids": [windows[w] for w in batch_indices]},
+                        padding="longest",
+                        return_tensors="pt"
+                    )
+                    outputs = model_finbert.bert(**input_sequence)
+                    logits = model_finbert.classifier(outputs.pooler_output)
+                    probabilities[batch_indices] = scipy.special.softmax(logits.numpy(), axis=-1)
+                    embeddings[batch_indices] = _mean_pool(
+                        outputs.last_hidden_state, input_sequence["attention_mask"]
+                    ).numpy()
+                    scored[batch_indices] = True
+            except Exception as e:
+                print(f"Error analyzing sentiment: {e}")
+        
+        # Combine windows into one article result, weighted by window length
+        owners = np.array(owners)
+        weights = np.array([len(window) for window in windows], dtype=float) * scored
+        for key, i in pending.items():
+            mask = owners == i
+            total_weight = weights[mask].sum()
+            if total_weight == 0:
+                continue
+            _encoding_cache[key] = (
+                (probabilities[mask] * weights[mask, None]).sum(axis=0) / total_weight,
+                (embeddings[mask] * weights[mask, None]).sum(axis=0) / total_weight
+            )
+    
+    return [_encoding_cache.get(key) for key in keys]
+
+def analyze_sentiment_batch(texts, batch_size=SENTIMENT_BATCH_SIZE, chunked=True):
+    labels = list(model_finbert.config.id2label.values())
+    results = []
+    
+    for encoding in encode_articles(texts, batch_size, chunked):
+        if encoding is None:
+            results.append(("neutral", 0.0, {}))
+            continue
+        scores = {label: float(p) for label, p in zip(labels, encoding[0])}
         sentiment = max(scores, key=scores.get)
-        probability = max(scores.values())
-        return sentiment, probability, scores
-    except Exception as e:
-        print(f"Error analyzing sentiment: {e}")
-        return "neutral", 0.0, {}
+        results.append((sentiment, scores[sentiment], scores))
+    
+    return results
 
 def extract_keywords(text, num_keywords=5):
+    key = _text_key(text)
+    if key in _keyword_cache and _keyword_cache[key][0] >= num_keywords:
+        return _keyword_cache[key][1][:num_keywords]
+    
     try:
-        keywords = kw_model.extract_keywords(text, keyphrase_ngram_range=(1, 3), stop_words='english', top_n=num_keywords)
-        return [kw[0] for kw in keywords]
+        top_n = max(num_keywords, KEYWORD_CACHE_SIZE)
+        encoding = encode_articles([text])[0]
+        doc_embeddings = encoding[1][None, :] if encoding is not None else None
+        keywords = kw_model.extract_keywords(
+            text,
+            keyphrase_ngram_range=(1, 3),
+            stop_words='english',
+            top_n=top_n,
+            doc_embeddings=doc_embeddings
+        )
+        keywords = [kw[0] for kw in keywords]
+        _keyword_cache[key] = (top_n, keywords)
+        return keywords[:num_keywords]
     except Exception as e:
         print(f"Error extracting keywords: {e}")
         return []
 
-def save_to_csv(data, year):
-    if not data: 
-        print(f"No financial articles met the criteria for {year}.")
-        return False
-        
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
+def score_financial_articles(current_date, financial_articles):
+    daily_articles = []
+    below_threshold_links = []
+    sentiments = analyze_sentiment_batch([article_data['text'] for _, article_data in financial_articles])
     
-    filename = f"{OUTPUT_DIR}/financial_news_{year}.csv"
-    file_exists = os.path.isfile(filename)
-    
-    with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        if not file_exists:
-            writer.writerow(['Date', 'Headline', 'URL', 'Full Text', 'Sentiment', 'Sentiment Probability', 'Positive Score', 'Negative Score', 'Neutral Score', 'Keywords'])
-        writer.writerows(data)
+    for (link, article_data), (sentiment, probability, scores) in zip(financial_articles, sentiments):
+        full_text = article_data['text']
+        keywords = extract_keywords(full_text)
+        keywords_str = ", ".join(keywords)
+        
+        headline = article_data['title'] or link.split('/')[-1].replace('-', ' ')
+        
+        if probability >= SENTIMENT_THRESHOLD:
+            daily_articles.append([
+                current_date.strftime("%Y-%m-%d"),
+                headline, 
+                link,
+                full_text,
+                sentiment,
+                probability,
+                scores.get('positive', 0.0),
+                scores.get('negative', 0.0),
+                scores.get('neutral', 0.0),
+                keywords_str
+            ])
+            print(f"✓ Article added: {sentiment} sentiment with {probability:.4f} probability")
+        else:
+            below_threshold_links.append(link)
+            print(f"✗ Article filtered out: sentiment probability {probability:.4f} below threshold {SENTIMENT_THRESHOLD}")
     
-    print(f"Saved {len(data)} financial articles to {filename}")
-    return True
+    return daily_articles, below_threshold_links
 
-def main():
-    current_date = START_DATE
+def process_day(current_date, articles, state, complete=True):
+    year = current_date.year
+    print(f"\nScoring articles for {current_date.strftime('%Y-%m-%d')}")
     
-    while current_date <= END_DATE:
-        year = current_date.year
-        print(f"\nFetching articles for {current_date.strftime('%Y-%m-%d')}")
-        
-        stock_links = fetch_guardian_links(current_date)
-        business_links = fetch_guardian_links(current_date, BUSINESS_URL)
-        
-        all_links = list(set(stock_links + business_links))
-        print(f"Found {len(all_links)} total articles to process")
-        
-        daily_articles = []
-        filtered_sentiment_count = 0
-        filtered_nonfinancial_count = 0
-        
-        for link in all_links:
-            print(f"\nScraping: {link}")
-            article_data = scrape_full_article(link)
-            full_text = article_data['text']
-            
-            if full_text:
-                if is_financial_content(full_text, link):
-                    sentiment, probability, scores = analyze_sentiment(full_text)
-                    keywords = extract_keywords(full_text)
-                    keywords_str = ", ".join(keywords)
-                    
-                    headline = article_data['title'] or link.split('/')[-1].replace('-', ' ')
-                    
-                    if probability >= SENTIMENT_THRESHOLD:
-                        daily_articles.append([
-                            current_date.strftime("%Y-%m-%d"),
-                            headline, 
-                            link,
-                            full_text,
-                            sentiment,
-                            probability,
-                            scores.get('positive', 0.0),
-                            scores.get('negative', 0.0),
-                            scores.get('neutral', 0.0),
-                            keywords_str
-                        ])
-                        print(f"✓ Article added: {sentiment} sentiment with {probability:.4f} probability")
-                    else:
-                        filtered_sentiment_count += 1
-                        print(f"✗ Article filtered out: sentiment probability {probability:.4f} below threshold {SENTIMENT_THRESHOLD}")
-                else:
-                    filtered_nonfinancial_count += 1
-                    print(f"✗ Article filtered out: not financial content")
-            time.sleep(2) 
+    non_financial_links = []
+    no_text_links = []
+    failed_links = []
+    financial_articles = []
+    
+    for link, article_data in articles:
+        full_text = article_data['text']
         
-        if daily_articles:
-            save_to_csv(daily_articles, year)
-            print(f"Results for {current_date.strftime('%Y-%m-%d')}:")
-            print(f"- Saved {len(daily_articles)} financial articles")
-            print(f"- Filtered out {filtered_nonfinancial_count} non-financial articles")
-            print(f"- Filtered out {filtered_sentiment_count} financial articles below sentiment threshold")
+        if full_text:
+            if is_financial_content(full_text, link):
+                financial_articles.append((link, article_data))
+            else:
+                non_financial_links.append(link)
+                print(f"✗ Article filtered out: not financial content")
+        elif article_data.get('error'):
+            failed_links.append(link)
         else:
-            print(f"No articles met the criteria for {current_date.strftime('%Y-%m-%d')}")
-        
-        current_date += timedelta(days=1)
+            no_text_links.append(link)
+    
+    daily_articles, below_threshold_links = score_financial_articles(current_date, financial_articles)
+    
+    if daily_articles:
+        save_articles(daily_articles, year)
+        print(f"Results for {current_date.strftime('%Y-%m-%d')}:")
+        print(f"- Saved {len(daily_articles)} financial articles")
+        print(f"- Filtered out {len(non_financial_links)} non-financial articles")
+        print(f"- Filtered out {len(below_threshold_links)} financial articles below sentiment threshold")
+        print(f"- Financial filter decisions by stage: {dict(filter_stage_counts)}")
+    else:
+        print(f"No articles met the criteria for {current_date.strftime('%Y-%m-%d')}")
+    
+    state.record_urls([row[2] for row in daily_articles], KEPT, current_date)
+    state.record_urls(non_financial_links, NON_FINANCIAL, current_date)
+    state.record_urls(below_threshold_links, BELOW_THRESHOLD, current_date)
+    state.record_urls(no_text_links, NO_TEXT, current_date)
+    state.record_urls(failed_links, FETCH_FAILED, current_date)
+    # A day with failed fetches stays pending; its recorded URLs are skipped when it is retried
+    if complete:
+        state.mark_date_completed(current_date)
+    else:
+        print(f"Some pages for {current_date.strftime('%Y-%m-%d')} could not be fetched; the day will be retried")
+    clear_article_caches()
+
+def main(resume=False, offline=False):
+    state = CrawlState()
+    # A fresh run scores every URL again; only --resume skips the ones a previous run recorded
+    crawler = Crawler(skip_url=state.is_url_scored if resume else None, cache=HttpCache(offline=offline))
+    
+    try:
+        for current_date, articles, complete in crawler.crawl(state.pending_dates(START_DATE, END_DATE, resume)):
+            process_day(current_date, articles, state, complete)
+    finally:
+        crawler.close()
+        state.close()
     
+    print(f"Crawl state: {state.summary()}")
     print("\nScraping complete! Check the FinancialNewsData folder for financial articles.")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    import sys
+    main(resume="--resume" in sys.argv, offline="--offline" in sys.argv)
\ No newline at end of file
@@ -0,0 +1,15 @@
+from functools import lru_cache
+
+from sentence_transformers import SentenceTransformer
+
+from config import CATEGORY_EMBEDDING_MODEL
+
+@lru_cache(maxsize=None)
+def get_embedding_model(model_name=CATEGORY_EMBEDDING_MODEL):
+    # One copy of each model per process, shared by the classifier and the article index
+    return SentenceTransformer(model_name)
+
+def embed_texts(texts, model_name=CATEGORY_EMBEDDING_MODEL, batch_size=64):
+    return get_embedding_model(model_name).encode(
+        list(texts), batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True
+    ).astype("float32")
@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from neo4j import GraphDatabase
+
+from config import (NEO4J_MAX_POOL_SIZE, NEO4J_CONNECTION_LIFETIME, NEO4J_ACQUISITION_TIMEOUT,
+                    NEO4J_LIVENESS_CHECK_TIMEOUT, NEO4J_WARM_CONNECTIONS, NEO4J_HEALTH_CHECK_INTERVAL)
+
+_last_health_check = {}
+
+def warm_up(driver, connections=NEO4J_WARM_CONNECTIONS):
+    # Concurrent sessions force the pool to open (and TLS-handshake) several connections up front
+    def ping(_):
+        with driver.session() as session:
+            session.run("RETURN 1").consume()
+
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        list(executor.map(ping, range(connections)))
+
+def create_driver(uri, user, password):
+    started = time.perf_counter()
+    driver = GraphDatabase.driver(
+        uri,
+        auth=(user, password),
+        max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+        # Recycled before Aura drops idle connections on its side
+        max_connection_lifetime=NEO4J_CONNECTION_LIFETIME,
+        connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+        liveness_check_timeout=NEO4J_LIVENESS_CHECK_TIMEOUT
+    )
+    driver.verify_connectivity()
+    warm_up(driver)
+    _last_health_check[id(driver)] = time.monotonic()
+    print(f"Neo4j driver ready in {1000 * (time.perf_counter() - started):.0f}ms")
+    return driver
+
+def is_healthy(driver, interval=NEO4J_HEALTH_CHECK_INTERVAL):
+    # Checked at most once per interval so that query latency does not pay for it
+    now = time.monotonic()
+    if now - _last_health_check.get(id(driver), 0) < interval:
+        return True
+    try:
+        driver.verify_connectivity()
+    except Exception as e:
+        print(f"Neo4j health check failed, reconnecting: {str(e)}")
+        _last_health_check.pop(id(driver), None)
+        driver.close()
+        return False
+    _last_health_check[id(driver)] = now
+    return True
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config import RETRIEVAL_TOP_K, ARTICLE_CACHE_ITEMS, ARTICLE_CACHE_TTL
+
+PREVIEW_CHARS = 500
+ARTICLE_FIELDS = ("article_id", "heading", "url", "full_text", "last_updated")
+
+ARTICLES_BY_SUBCATEGORIES_QUERY = """
+UNWIND $subcategories AS subcategory
+MATCH (sc:Subcategory {name_lower: subcategory})<-[r:BELONGS_TO]-(a:Article)
+WITH a, sum(r.score) AS score, collect(sc.name) AS matched
+ORDER BY score DESC
+LIMIT $limit
+RETURN a.article_id AS article_id, a.heading AS heading, a.url AS url,
+       left(coalesce(a.full_text, ''), $preview_chars) AS full_text,
+       score, matched, a.last_updated AS last_updated
+"""
+
+def normalize_name(name):
+    return " ".join(str(name).lower().split())
+
+def fetch_articles_by_subcategories(session, subcategories, limit=RETRIEVAL_TOP_K, preview_chars=PREVIEW_CHARS):
+    # One round trip; an article tagged with several of the subcategories has its scores summed
+    names = list(dict.fromkeys(normalize_name(name) for name in subcategories))
+    if not names:
+        return []
+    result = session.run(ARTICLES_BY_SUBCATEGORIES_QUERY, subcategories=names, limit=limit, preview_chars=preview_chars)
+    return [record.data() for record in result]
+
+def fetch_articles_by_ids(session, article_ids, fields=ARTICLE_FIELDS):
+    # One round trip for the whole list, returned in the caller's order; only the requested fields are sent back
+    unknown = set(fields) - set(ARTICLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown article fields: {sorted(unknown)}")
+    article_ids = list(article_ids)
+    if not article_ids:
+        return []
+    projection = ", ".join(f".{field}" for field in dict.fromkeys(("article_id",) + tuple(fields)))
+    query = f"MATCH (a:Article) WHERE a.article_id IN $article_ids RETURN a {{{projection}}} AS article"
+    found = {record["article"]["article_id"]: record["article"] for record in session.run(query, article_ids=list(dict.fromkeys(article_ids)))}
+    return [{field: found[article_id].get(field) for field in fields} for article_id in article_ids if article_id in found]
+
+class ArticleCache:
+    # Read-through LRU in front of fetch_articles_by_ids; entries always hold every field so any projection can be served
+    def __init__(self, max_items=ARTICLE_CACHE_ITEMS, ttl=ARTICLE_CACHE_TTL):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.articles = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _get(self, article_id, now):
+        entry = self.articles.get(article_id)
+        if entry is None or now - entry[1] >= self.ttl:
+            return None
+        self.articles.move_to_end(article_id)
+        return entry[0]
+
+    def fetch(self, driver, article_ids, fields=ARTICLE_FIELDS):
+        article_ids = list(article_ids)
+        now = time.monotonic()
+        with self.lock:
+            cached = {article_id: self._get(article_id, now) for article_id in dict.fromkeys(article_ids)}
+            missing = [article_id for article_id, article in cached.items() if article is None]
+            self.stats["hits"] += len(cached) - len(missing)
+            self.stats["misses"] += len(missing)
+
+        if missing:
+            with driver.session() as session:
+                fetched = fetch_articles_by_ids(session, missing)
+            with self.lock:
+                for article in fetched:
+                    cached[article["article_id"]] = article
+                    self.articles[article["article_id"]] = (article, now)
+                    self.articles.move_to_end(article["article_id"])
+                while len(self.articles) > self.max_items:
+                    self.articles.popitem(last=False)
+
+        return [
+            {field: cached[article_id].get(field) for field in fields}
+            for article_id in article_ids if cached.get(article_id) is not None
+        ]
@@ -0,0 +1,106 @@
+import time
+
+from config import NEO4J_INDEX_TIMEOUT
+from graph_queries import normalize_name
+
+CONSTRAINTS = {
+    "article_id_unique": "CREATE CONSTRAINT article_id_unique IF NOT EXISTS FOR (a:Article) REQUIRE a.article_id IS UNIQUE",
+    "article_url_unique": "CREATE CONSTRAINT article_url_unique IF NOT EXISTS FOR (a:Article) REQUIRE a.url IS UNIQUE",
+    "category_name_unique": "CREATE CONSTRAINT category_name_unique IF NOT EXISTS FOR (c:Category) REQUIRE c.name IS UNIQUE",
+    "subcategory_name_unique": "CREATE CONSTRAINT subcategory_name_unique IF NOT EXISTS FOR (sc:Subcategory) REQUIRE sc.name IS UNIQUE",
+}
+
+INDEXES = {
+    "subcategory_name_lower": "CREATE INDEX subcategory_name_lower IF NOT EXISTS FOR (sc:Subcategory) ON (sc.name_lower)",
+    "article_published_date": "CREATE INDEX article_published_date IF NOT EXISTS FOR (a:Article) ON (a.published_date)",
+    "article_text": "CREATE FULLTEXT INDEX article_text IF NOT EXISTS FOR (a:Article) ON EACH [a.heading, a.full_text]",
+}
+
+DEDUPLICATE_ARTICLES_QUERY = """
+MATCH (a:Article) WHERE a.url IS NOT NULL
+WITH a.url AS url, collect(a) AS nodes WHERE size(nodes) > 1
+UNWIND nodes[1..] AS duplicate
+DETACH DELETE duplicate
+RETURN count(*) AS removed
+"""
+
+SUBCATEGORY_NAMES_QUERY = "MATCH (sc:Subcategory) WHERE sc.name IS NOT NULL RETURN sc.name AS name, sc.name_lower AS name_lower"
+
+SET_NAME_LOWER_QUERY = """
+UNWIND $updates AS row
+MATCH (sc:Subcategory {name: row.name})
+SET sc.name_lower = row.name_lower
+"""
+
+def deduplicate_articles(session):
+    # Earlier exports CREATEd a fresh Article per run; the URL constraint cannot be added until the copies go
+    removed = session.run(DEDUPLICATE_ARTICLES_QUERY).single()["removed"]
+    if removed:
+        print(f"Removed {removed} duplicate Article nodes")
+
+def backfill_subcategory_names(session):
+    # Normalized in Python with the same function the lookups use; Cypher has no equivalent of
+    # collapsing internal whitespace, and older backfills wrote toLower(trim(name)) values
+    updates = [
+        {"name": record["name"], "name_lower": normalize_name(record["name"])}
+        for record in session.run(SUBCATEGORY_NAMES_QUERY)
+        if record["name_lower"] != normalize_name(record["name"])
+    ]
+    if updates:
+        session.run(SET_NAME_LOWER_QUERY, updates=updates).consume()
+        print(f"Normalized name_lower on {len(updates)} Subcategory nodes")
+
+def wait_for_indexes(session, names, timeout=NEO4J_INDEX_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while True:
+        states = {
+            record["name"]: record["state"]
+            for record in session.run("SHOW INDEXES YIELD name, state WHERE name IN $names RETURN name, state", names=names)
+        }
+        missing = [name for name in names if name not in states]
+        failed = [name for name, state in states.items() if state == "FAILED"]
+        pending = [name for name, state in states.items() if state != "ONLINE"]
+        if missing or failed:
+            raise RuntimeError(f"Neo4j schema incomplete: missing {missing}, failed {failed}")
+        if not pending:
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Neo4j indexes still populating after {timeout}s: {pending}")
+        time.sleep(1)
+
+def ensure_schema(driver, deduplicate=False, timeout=NEO4J_INDEX_TIMEOUT):
+    # Idempotent: every statement is IF NOT EXISTS, so this is safe to run on each export and app start
+    started = time.perf_counter()
+    with driver.session() as session:
+        if deduplicate:
+            deduplicate_articles(session)
+        backfill_subcategory_names(session)
+        # Plain indexes go first and each statement stands alone: a uniqueness constraint fails on a
+        # graph that still holds duplicates, and that must not stop the indexes the queries rely on
+        created = []
+        for name, statement in list(INDEXES.items()) + list(CONSTRAINTS.items()):
+            try:
+                session.run(statement).consume()
+                created.append(name)
+            except Exception as e:
+                if name in CONSTRAINTS:
+                    print(f"Could not create constraint {name}: {e}. "
+                          "Run `python graph_schema.py --deduplicate` to remove the duplicates it rejects")
+                else:
+                    print(f"Could not create index {name}: {e}")
+        # Each uniqueness constraint is backed by an index of the same name
+        wait_for_indexes(session, created, timeout)
+    failed = len(INDEXES) + len(CONSTRAINTS) - len(created)
+    print(f"Neo4j schema ready in {time.perf_counter() - started:.1f}s" + (f" ({failed} statements failed)" if failed else ""))
+
+if __name__ == "__main__":
+    import os
+    import sys
+    from dotenv import load_dotenv
+    from neo4j import GraphDatabase
+    load_dotenv()
+    driver = GraphDatabase.driver(os.getenv("NEO4J_URL"), auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD")))
+    try:
+        ensure_schema(driver, deduplicate="--deduplicate" in sys.argv)
+    finally:
+        driver.close()
@@ -1,109 +1,207 @@
-import pandas as pd
 from neo4j import GraphDatabase
 import os
+import time
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import ast
-from config import OUTPUT_DIR
+from config import OUTPUT_DIR, NEO4J_EXPORT_BATCH_SIZE, NEO4J_EXPORT_WORKERS
+from storage import list_data_files, read_data_file, article_id_for_url, compact_partitions
+from graph_queries import normalize_name
+from graph_schema import ensure_schema
 
 load_dotenv()
 
+EXPORT_COLUMNS = ['Date', 'Headline', 'URL', 'Full Text', 'Category_Score_Map']
+
+TAXONOMY_QUERY = """
+UNWIND $categories AS category
+MERGE (c:Category {name: category.name})
+SET c.total_score = category.total_score,
+    c.last_updated = datetime()
+WITH c, category
+UNWIND category.subcategories AS subcategory
+MERGE (sc:Subcategory {name: subcategory.name})
+SET sc.name_lower = subcategory.name_lower
+MERGE (c)-[:HAS_SUBCATEGORY]->(sc)
+"""
+
+FINGERPRINT_QUERY = """
+UNWIND $urls AS url
+MATCH (a:Article {url: url})
+RETURN a.url AS url, a.fingerprint AS fingerprint
+"""
+
+ARTICLE_BATCH_QUERY = """
+UNWIND $articles AS row
+MERGE (a:Article {url: row.url})
+SET a.article_id = row.article_id,
+    a.heading = row.heading,
+    a.full_text = row.full_text,
+    a.published_date = CASE WHEN row.published_date = '' THEN null ELSE date(row.published_date) END,
+    a.fingerprint = row.fingerprint,
+    a.last_updated = datetime()
+WITH a, row
+OPTIONAL MATCH (a)-[stale:BELONGS_TO]->(old:Subcategory)
+WHERE NOT old.name IN [subcategory IN row.subcategories | subcategory.name]
+DELETE stale
+WITH DISTINCT a, row
+UNWIND row.subcategories AS subcategory
+MATCH (sc:Subcategory {name: subcategory.name})
+MERGE (a)-[r:BELONGS_TO]->(sc)
+SET r.score = subcategory.score,
+    r.last_updated = datetime()
+"""
+
+def text_value(value, default=''):
+    return value if isinstance(value, str) else default
+
+def article_fingerprint(article):
+    # Covers every exported field, so an unchanged fingerprint means the node is already up to date
+    payload = dict(article, subcategories=sorted((s["name"], s["score"]) for s in article["subcategories"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
 class GraphDBExporter:
-    def __init__(self):
+    def __init__(self, batch_size=NEO4J_EXPORT_BATCH_SIZE, workers=NEO4J_EXPORT_WORKERS, force=False):
         self.uri = os.getenv("NEO4J_URL")
         self.user = os.getenv("NEO4J_USER")
         self.password = os.getenv("NEO4J_PASSWORD")
-        
+        self.batch_size = batch_size
+        self.workers = workers
+        self.force = force
+        self.counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+
         if not all([self.uri, self.user, self.password]):
             raise ValueError("Missing Neo4j credentials in .env file")
-            
+
         self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
-    
+
     def close(self):
         self.driver.close()
-    
-    def export_data(self, input_dir=OUTPUT_DIR):
-        with self.driver.session() as session:
-            for file_name in os.listdir(input_dir):
-                if not file_name.endswith(".csv"):
+
+    def build_rows(self, file_name, df):
+        # One parameter map per article with its subcategory scores nested inside
+        articles = []
+        categories = {}
+        skipped = 0
+        for _, row in df.iterrows():
+            try:
+                score_map = ast.literal_eval(row['Category_Score_Map'])
+            except (ValueError, SyntaxError, KeyError) as e:
+                print(f"Error parsing Category_Score_Map in {file_name}: {e}")
+                continue
+            url = text_value(row.get('URL'))
+            if not url:
+                skipped += 1
+                continue
+
+            subcategories = []
+            for category, data in score_map.items():
+                if category == "Uncategorized":
                     continue
-                
-                file_path = os.path.join(input_dir, file_name)
-                df = pd.read_csv(file_path)
-                
-                for _, row in df.iterrows():
-                    try:
-                        score_map = ast.literal_eval(row['Category_Score_Map'])
-                    except (ValueError, SyntaxError, KeyError) as e:
-                        print(f"Error parsing Category_Score_Map in {file_name}: {e}")
-                        continue
-                    article_id = session.execute_write(
-                        self._create_article_node,
-                        row.get('Headline', 'No Heading'),
-                        row.get('URL', ''),
-                        row.get('Full Text', '')
-                    )
-                    
-                    for category, data in score_map.items():
-                        if category == "Uncategorized":
-                            continue
-                            
-                        session.execute_write(
-                            self._create_category_structure,
-                            category,
-                            data,
-                            article_id
-                        )
-    
-    @staticmethod
-    def _create_article_node(tx, heading, url, full_text):
-        query = """
-        CREATE (a:Article {
-            heading: $heading,
-            url: $url,
-            full_text: $full_text,
-            article_id: randomUUID(),
-            last_updated: datetime()
-        })
-        RETURN a.article_id as article_id
-        """
-        result = tx.run(query, heading=heading, url=url, full_text=full_text)
-        record = result.single()
-        return record["article_id"] if record else None
-    
-    @staticmethod
-    def _create_category_structure(tx, category, data, article_id):
-        category_query = """
-        MERGE (c:Category {name: $name})
-        SET c.total_score = $score,
-            c.last_updated = datetime()
-        """
-        tx.run(category_query, name=category, score=data.get('total_score', 0.0))
-        
-        for subcat, subdata in data.get('subcategories', {}).items():
-            score = subdata.get('score') if isinstance(subdata, dict) else subdata
-            
-            subcat_query = """
-            MATCH (a:Article {article_id: $article_id})
-            MERGE (sc:Subcategory {name: $subcat})
-            MERGE (c:Category {name: $cat})
-            MERGE (c)-[:HAS_SUBCATEGORY]->(sc)
-            MERGE (a)-[r:BELONGS_TO]->(sc)
-            SET r.score = $score,
-                r.last_updated = datetime()
-            """
-            tx.run(subcat_query,
-                  article_id=article_id,
-                  subcat=subcat,
-                  cat=category,
-                  score=score)
+                entry = categories.setdefault(category, {"name": category, "subcategories": {}})
+                entry["total_score"] = data.get('total_score', 0.0)
+                for subcat, subdata in data.get('subcategories', {}).items():
+                    score = subdata.get('score') if isinstance(subdata, dict) else subdata
+                    entry["subcategories"][subcat] = {"name": subcat, "name_lower": normalize_name(subcat)}
+                    subcategories.append({"name": subcat, "score": score})
+
+            article = {
+                "url": url,
+                "heading": text_value(row.get('Headline'), 'No Heading'),
+                "full_text": text_value(row.get('Full Text')),
+                "published_date": text_value(row.get('Date'))[:10],
+                "subcategories": subcategories
+            }
+            article["article_id"] = article_id_for_url(url)
+            article["fingerprint"] = article_fingerprint(article)
+            articles.append(article)
+
+        if skipped:
+            print(f"Skipped {skipped} articles without a URL in {file_name}")
+        taxonomy = [dict(entry, subcategories=list(entry["subcategories"].values())) for entry in categories.values()]
+        return articles, taxonomy
+
+    def fetch_fingerprints(self, urls, chunk_size=10000):
+        fingerprints = {}
+        with self.driver.session() as session:
+            for start in range(0, len(urls), chunk_size):
+                result = session.run(FINGERPRINT_QUERY, urls=urls[start:start + chunk_size])
+                fingerprints.update((record["url"], record["fingerprint"]) for record in result)
+        return fingerprints
+
+    def select_changed(self, articles):
+        # A file can list the same URL twice; keep the last row, as sequential MERGEs would
+        articles = list({article["url"]: article for article in articles}.values())
+        if self.force:
+            self.counts["updated"] += len(articles)
+            return articles
+        existing = self.fetch_fingerprints([article["url"] for article in articles])
+        changed = []
+        for article in articles:
+            if article["url"] not in existing:
+                self.counts["inserted"] += 1
+            elif existing[article["url"]] != article["fingerprint"]:
+                self.counts["updated"] += 1
+            else:
+                self.counts["unchanged"] += 1
+                continue
+            changed.append(article)
+        return changed
+
+    def _write_batch(self, label, articles):
+        started = time.perf_counter()
+        with self.driver.session() as session:
+            session.execute_write(lambda tx: tx.run(ARTICLE_BATCH_QUERY, articles=articles).consume())
+        print(f"{label}: {len(articles)} articles in {time.perf_counter() - started:.2f}s")
+        return len(articles)
+
+    def export_file(self, file_name, file_path, executor):
+        started = time.perf_counter()
+        df = read_data_file(file_path, columns=EXPORT_COLUMNS)
+        articles, taxonomy = self.build_rows(file_name, df)
+        articles = self.select_changed(articles)
+        if not articles:
+            print(f"{file_name} unchanged since the last export ({time.perf_counter() - started:.1f}s)")
+            return 0
+
+        # Categories and subcategories go in first, in one transaction, so the parallel
+        # article batches only MATCH them and never race to create the same node
+        with self.driver.session() as session:
+            session.execute_write(lambda tx: tx.run(TAXONOMY_QUERY, categories=taxonomy).consume())
+
+        batches = [articles[start:start + self.batch_size] for start in range(0, len(articles), self.batch_size)]
+        futures = [
+            executor.submit(self._write_batch, f"{file_name} batch {number}/{len(batches)}", batch)
+            for number, batch in enumerate(batches, 1)
+        ]
+        exported = sum(future.result() for future in futures)
+        elapsed = time.perf_counter() - started
+        print(f"Exported {exported} articles from {file_name} in {elapsed:.1f}s ({exported / max(elapsed, 1e-9):.0f} articles/s)")
+        return exported
+
+    def export_data(self, input_dir=OUTPUT_DIR):
+        ensure_schema(self.driver, deduplicate=True)
+        # The fingerprint query and taxonomy transaction run once per file
+        compact_partitions(input_dir)
+        started = time.perf_counter()
+        total = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for file_name, file_path in list_data_files(input_dir):
+                total += self.export_file(file_name, file_path, executor)
+        print(f"Exported {total} articles in {time.perf_counter() - started:.1f}s: "
+              f"{self.counts['inserted']} inserted, {self.counts['updated']} updated, {self.counts['unchanged']} unchanged")
+        return self.counts
 
 if __name__ == "__main__":
     try:
-        exporter = GraphDBExporter()
+        import sys
+        exporter = GraphDBExporter(force="--force" in sys.argv)
         exporter.export_data()
         print("✅ Data exported to Neo4j successfully")
     except Exception as e:
         print(f"❌ Error: {e}")
     finally:
         if 'exporter' in locals():
-            exporter.close()"}}}
\ No newline at end of file
+            exporter.close()
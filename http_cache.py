@@ -0,0 +1,145 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES
+
+class CacheMiss(Exception):
+    pass
+
+class HttpCache:
+    def __init__(self, directory=HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES, offline=False):
+        self.directory = directory
+        self.blob_dir = os.path.join(directory, "blobs")
+        self.max_bytes = max_bytes
+        self.offline = offline
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def close(self):
+        self.conn.close()
+
+    def _blob_path(self, content_hash):
+        return os.path.join(self.blob_dir, content_hash[:2], content_hash + ".z")
+
+    def _lookup(self, url):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT content_hash, etag, last_modified FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+
+    def _read(self, url, content_hash):
+        with open(self._blob_path(content_hash), "rb") as f:
+            body = zlib.decompress(f.read()).decode("utf-8")
+        with self.lock:
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self.conn.commit()
+        return body
+
+    def _store(self, url, body, etag, last_modified):
+        data = zlib.compress(body.encode("utf-8"))
+        # Blobs are named by content so identical pages share one file
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(content_hash)
+
+        with self.lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            previous = self.conn.execute("SELECT content_hash, size FROM responses WHERE url = ?", (url,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (url, content_hash, size, etag, last_modified, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, content_hash, len(data), etag, last_modified, time.time())
+            )
+            self.total_bytes += len(data) - (previous[1] if previous else 0)
+            if previous and previous[0] != content_hash:
+                self._remove_blob_if_unused(previous[0])
+            self._evict()
+            self.conn.commit()
+
+    def _remove_blob_if_unused(self, content_hash):
+        in_use = self.conn.execute(
+            "SELECT 1 FROM responses WHERE content_hash = ? LIMIT 1", (content_hash,)
+        ).fetchone()
+        if not in_use:
+            try:
+                os.remove(self._blob_path(content_hash))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        # Least recently used entries go first until the cache fits its cap again
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute(
+                "SELECT url, content_hash, size FROM responses ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for url, content_hash, size in rows:
+                self.conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self._remove_blob_if_unused(content_hash)
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def get(self, session, url, timeout=10):
+        entry = self._lookup(url)
+        if entry is not None and not os.path.exists(self._blob_path(entry[0])):
+            entry = None
+        if self.offline:
+            if entry is None:
+                self.misses += 1
+                raise CacheMiss(f"{url} is not cached and offline mode is on")
+            self.hits += 1
+            return self._read(url, entry[0])
+
+        headers = {}
+        if entry is not None:
+            if entry[1]:
+                headers["If-None-Match"] = entry[1]
+            if entry[2]:
+                headers["If-Modified-Since"] = entry[2]
+
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            self.revalidated += 1
+            return self._read(url, entry[0])
+
+        response.raise_for_status()
+        self.misses += 1
+        self._store(url, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return response.text
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "bytes": self.total_bytes
+        }
@@ -0,0 +1,169 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL, LLM_CACHE_MEMORY_ITEMS, LLM_CACHE_ACCESS_FLUSH
+
+def normalize_input(text):
+    return re.sub(r"\s+", " ", str(text)).strip()
+
+def cache_key(model_name, template_version, text):
+    digest = hashlib.sha256(normalize_input(text).encode("utf-8")).hexdigest()
+    return f"{model_name}:{template_version}:{digest}"
+
+class LLMCache:
+    def __init__(self, path=LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL,
+                 memory_items=LLM_CACHE_MEMORY_ITEMS, access_flush=LLM_CACHE_ACCESS_FLUSH):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self.memory = OrderedDict()
+        # last_access only orders eviction, so hits update it in memory and it is written in batches
+        self.access_flush = access_flush
+        self.pending_access = {}
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent with NORMAL; a crash can only lose the last few commits of a cache
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "hit_seconds": 0.0}
+
+    def _remember(self, key, response, created_at):
+        self.memory[key] = (response, created_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def _flush_access(self):
+        if self.pending_access:
+            self.conn.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                [(last_access, key) for key, last_access in self.pending_access.items()]
+            )
+            self.pending_access.clear()
+
+    def get(self, key):
+        started = time.perf_counter()
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.memory.move_to_end(key)
+                self.pending_access[key] = now
+                self.stats["memory_hits"] += 1
+                self.stats["hit_seconds"] += time.perf_counter() - started
+                return entry[0]
+
+            row = self.conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                self.stats["misses"] += 1
+                return None
+            self.pending_access[key] = now
+            if len(self.pending_access) >= self.access_flush:
+                self._flush_access()
+                self.conn.commit()
+            self._remember(key, row[0], row[1])
+            self.stats["disk_hits"] += 1
+            self.stats["hit_seconds"] += time.perf_counter() - started
+            return row[0]
+
+    def set(self, key, response):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self.lock:
+            # Eviction below orders by last_access, so the batched hits are written first
+            self._flush_access()
+            previous = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self.total_bytes += size - (previous[0] if previous else 0)
+            self._evict(now)
+            self.conn.commit()
+            self._remember(key, response, now)
+
+    def _evict(self, now):
+        expired = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses WHERE created_at <= ?", (now - self.ttl,)
+        ).fetchone()[0]
+        if expired:
+            self.conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,))
+            self.total_bytes -= expired
+
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 100").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.memory.pop(key, None)
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def cached_call(self, model_name, template_version, prompt, call, parse=lambda text: text):
+        # Only responses that parse are stored, so a bad reply is never served twice
+        key = cache_key(model_name, template_version, prompt)
+        cached = self.get(key)
+        if cached is not None:
+            try:
+                return parse(cached)
+            except Exception:
+                pass
+
+        response_text = call()
+        result = parse(response_text)
+        self.set(key, response_text)
+        return result
+
+    def cached_stream(self, model_name, template_version, prompt, stream_call):
+        # A cached response replays as one chunk; a fresh one is stored only once the stream has completed
+        key = cache_key(model_name, template_version, prompt)
+        cached = self.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        for chunk in stream_call():
+            chunks.append(chunk)
+            yield chunk
+        self.set(key, "".join(chunks))
+
+    def summary(self):
+        with self.lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                "hits": hits,
+                "misses": self.stats["misses"],
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "avg_hit_ms": 1000 * self.stats["hit_seconds"] / hits if hits else 0.0,
+                "bytes": self.total_bytes
+            }
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def get_llm_cache():
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMCache()
+        return _shared_cache
@@ -0,0 +1,149 @@
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from llm_cache import cache_key
+from rate_limit import TokenBucket
+from config import LLM_CONCURRENCY, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_RETRIES
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+def is_rate_limit_error(error):
+    if getattr(error, "code", None) == 429 or type(error).__name__ in ("ResourceExhausted", "RateLimitError", "TooManyRequests"):
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "quota" in message
+
+def retry_after_seconds(error):
+    match = re.search(r"retry[_ ]?(?:after|delay)[^0-9]*([0-9.]+)", str(error), re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+class ScoringEngine:
+    def __init__(self, client, concurrency=LLM_CONCURRENCY, requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=LLM_TOKENS_PER_MINUTE, max_retries=LLM_MAX_RETRIES, base_backoff=2, max_backoff=60,
+                 cache=None, model_name="llm"):
+        self.client = client
+        self.cache = cache
+        self.model_name = model_name
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.request_bucket = TokenBucket(requests_per_minute / 60, max(1, concurrency))
+        self.token_bucket = TokenBucket(tokens_per_minute / 60, tokens_per_minute / 6)
+
+        # A rate-limit error pauses every worker, not just the one that hit it
+        self.cooldown_until = 0.0
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "failed": 0, "completed": 0}
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def _wait_for_cooldown(self):
+        while True:
+            with self.lock:
+                remaining = self.cooldown_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def run(self, prompt, parse, template_version=None):
+        key = None
+        if self.cache is not None and template_version is not None:
+            key = cache_key(self.model_name, template_version, prompt)
+            cached = self.cache.get(key)
+            if cached is not None:
+                try:
+                    return parse(cached)
+                except Exception:
+                    pass
+
+        tokens = estimate_tokens(prompt)
+        for attempt in range(self.max_retries):
+            self._wait_for_cooldown()
+            self.request_bucket.acquire()
+            self.token_bucket.acquire(tokens)
+            self._count("requests")
+            try:
+                response_text = self.client.generate_content(prompt).text
+                result = parse(response_text)
+                if key is not None:
+                    self.cache.set(key, response_text)
+                return result
+            except Exception as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                self._count("retries")
+                # Full jitter keeps concurrent workers from retrying in lockstep
+                delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+                if is_rate_limit_error(e):
+                    self._count("rate_limited")
+                    delay = max(delay, retry_after_seconds(e) or 0)
+                    with self.lock:
+                        self.cooldown_until = max(self.cooldown_until, time.monotonic() + delay)
+                time.sleep(delay)
+
+    def map(self, items, build_prompt, parse, template_version=None):
+        # Yields (key, result) in completion order; failed items yield None
+        items = iter(items)
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = {}
+            while True:
+                while len(pending) < self.concurrency * 2:
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    key, payload = item
+                    pending[executor.submit(self.run, build_prompt(payload), parse, template_version)] = key
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = pending.pop(future)
+                    try:
+                        result = future.result()
+                        self._count("completed")
+                    except Exception as e:
+                        print(f"Error scoring {key} after {self.max_retries} attempts: {str(e)}")
+                        self._count("failed")
+                        result = None
+                    yield key, result
+
+        elapsed = time.monotonic() - started
+        print(f"Scoring engine: {self.stats} in {elapsed:.1f}s "
+              f"({self.stats['completed'] / max(elapsed, 1e-9):.2f} articles/s)")
+        if self.cache is not None:
+            print(f"LLM cache: {self.cache.summary()}")
+
+class FakeModelClient:
+    def __init__(self, response_text, latency=0.5, rate_limit_every=0):
+        self.response_text = response_text
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self.lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(self.latency)
+        if self.rate_limit_every and calls % self.rate_limit_every == 0:
+            raise RuntimeError("429 rate limit exceeded, retry after 1 seconds")
+        return type("FakeResponse", (), {"text": self.response_text})()
+
+if __name__ == "__main__":
+    import json
+    import sys
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else LLM_CONCURRENCY
+    client = FakeModelClient(json.dumps({"keywords": [{"inflation": 0.9}]}), latency=0.2, rate_limit_every=25)
+    engine = ScoringEngine(client, concurrency=concurrency, requests_per_minute=6000, base_backoff=0.1)
+    results = list(engine.map(((i, "Sample article text") for i in range(200)), lambda text: text, json.loads))
+    print(f"Scored {sum(1 for _, result in results if result)} of {len(results)} articles with {client.calls} calls")
@@ -1,15 +1,28 @@
 import os
 import pandas as pd
 import json
-import time
 import google.generativeai as genai
 from dotenv import load_dotenv
-from config import CATEGORY_KEYWORDS
+from config import CATEGORY_KEYWORDS, PROCESSING_JOURNAL_PATH
+from llm_cache import get_llm_cache
+from llm_scoring import ScoringEngine, estimate_tokens
+from results_journal import ResultsJournal
+from storage import list_data_files, read_data_file, write_data_file, compact_partitions
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.5-flash-preview-04-17')
+MODEL_NAME = 'gemini-2.5-flash-preview-04-17'
+model = genai.GenerativeModel(MODEL_NAME)
+
+COMPACT_EVERY = 50
+BATCH_TOKEN_BUDGET = 24000
+BATCH_MAX_ARTICLES = 10
+KEYWORD_TEMPLATE_VERSION = "keywords-v1"
+BATCH_KEYWORD_TEMPLATE_VERSION = "keywords-batch-v1"
+
+def create_engine(**kwargs):
+    return ScoringEngine(model, cache=get_llm_cache(), model_name=MODEL_NAME, **kwargs)
 
 def clean_keywords(text):
     if pd.isna(text):
@@ -17,8 +30,8 @@ def clean_keywords(text):
     keywords = [kw.strip().lower() for kw in str(text).split(",")]
     return [kw for kw in keywords if kw]
 
-def get_keywords_and_relevance(text):
-    prompt = f"""
+def build_keyword_prompt(text):
+    return f"""
     Extract the most relevant keywords from this news article and assign a relevance score to each keyword on a scale of 0.0 to 1.0.
     News: {text}
     
@@ -33,112 +46,189 @@ def get_keywords_and_relevance(text):
     
     Only include keywords that are highly relevant to the content.
     """
+
+def strip_code_fence(response_text):
+    response_text = response_text.strip()
+    
+    if response_text.startswith("```") and response_text.endswith("```"):
+        clean_text = response_text.split("```")[1].strip()
+        if clean_text.startswith("json"):
+            clean_text = clean_text[4:].strip()
+    else:
+        clean_text = response_text
+    
+    return clean_text
+
+def parse_keyword_response(response_text):
+    result = json.loads(strip_code_fence(response_text))
+    return result["keywords"]
+
+def build_batch_keyword_prompt(batch):
+    articles = "\n\n".join(f"ARTICLE {position}:\n{text}" for position, (_, text) in enumerate(batch, start=1))
+    return f"""
+    Extract the most relevant keywords from EACH of the following news articles and assign a relevance score to each keyword on a scale of 0.0 to 1.0.
+    Score every article independently of the others.
     
-    max_retries = 3
-    retry_count = 0
-    backoff_time = 2
+    {articles}
     
-    while retry_count < max_retries:
+    Return strictly in this exact format without any markdown or code blocks, with one entry per article using its ARTICLE number as the id:
+    {{
+        "articles": [
+            {{"id": 1, "keywords": [{{"keyword1": 0.95}}, {{"keyword2": 0.12}}]}},
+            {{"id": 2, "keywords": [{{"keyword1": 0.87}}]}},
+            ...
+        ]
+    }}
+    
+    Only include keywords that are highly relevant to each article.
+    """
+
+def is_valid_keyword_list(keywords):
+    if not isinstance(keywords, list) or not keywords:
+        return False
+    for item in keywords:
+        if not isinstance(item, dict) or len(item) != 1:
+            return False
+        keyword, score = next(iter(item.items()))
+        if not isinstance(keyword, str) or not isinstance(score, (int, float)) or not 0.0 <= score <= 1.0:
+            return False
+    return True
+
+def parse_batch_keyword_response(response_text):
+    # Entries with an unknown id or malformed keywords are dropped and retried one by one
+    result = json.loads(strip_code_fence(response_text))
+    parsed = {}
+    for entry in result["articles"]:
         try:
-            response = model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            if response_text.startswith("```") and response_text.endswith("```"):
-                clean_text = response_text.split("```")[1].strip()
-                if clean_text.startswith("json"):
-                    clean_text = clean_text[4:].strip()
-            else:
-                clean_text = response_text
-            
-            result = json.loads(clean_text)
-            return result["keywords"]
-            
-        except Exception as e:
-            retry_count += 1
-            if retry_count < max_retries:
-                import time
-                time.sleep(backoff_time)
-                backoff_time *= 2
-                continue
+            position = int(entry["id"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if is_valid_keyword_list(entry.get("keywords")):
+            parsed[position] = entry["keywords"]
+    return parsed
+
+def pack_keyword_batches(rows, token_budget=BATCH_TOKEN_BUDGET, max_articles=BATCH_MAX_ARTICLES):
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for key, text in rows:
+        tokens = estimate_tokens(text)
+        if batch and (batch_tokens + tokens > token_budget or len(batch) >= max_articles):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append((key, text))
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def score_articles(engine, rows, batch_mode=True):
+    if not batch_mode:
+        yield from engine.map(rows, build_keyword_prompt, parse_keyword_response, KEYWORD_TEMPLATE_VERSION)
+        return
+    
+    batches = pack_keyword_batches(rows)
+    # Articles that fill a batch on their own keep the single-article prompt
+    fallback = [batch[0] for batch in batches if len(batch) == 1]
+    multi_article_batches = [(i, batch) for i, batch in enumerate(batches) if len(batch) > 1]
+    
+    for i, parsed in engine.map(multi_article_batches, build_batch_keyword_prompt, parse_batch_keyword_response,
+                                BATCH_KEYWORD_TEMPLATE_VERSION):
+        for position, (key, text) in enumerate(batches[i], start=1):
+            keywords = (parsed or {}).get(position)
+            if keywords:
+                yield key, keywords
             else:
-                print(f"Error extracting keywords after {max_retries} attempts: {str(e)}")
-                return []
+                fallback.append((key, text))
+    
+    if fallback:
+        print(f"Scoring {len(fallback)} articles with single-article prompts")
+        yield from engine.map(fallback, build_keyword_prompt, parse_keyword_response, KEYWORD_TEMPLATE_VERSION)
+
+def get_keywords_and_relevance(text, engine=None):
+    engine = engine or create_engine(concurrency=1)
+    try:
+        return engine.run(build_keyword_prompt(text), parse_keyword_response, KEYWORD_TEMPLATE_VERSION)
+    except Exception as e:
+        print(f"Error extracting keywords after {engine.max_retries} attempts: {str(e)}")
+        return []
 
-def process_directory():
+def article_keys(df):
+    index_keys = pd.Series([f"row:{idx}" for idx in df.index], index=df.index)
+    if "URL" not in df.columns:
+        return index_keys
+    return df["URL"].where(df["URL"].notna() & (df["URL"] != ""), index_keys).astype(str)
+
+def compact_results(journal, file_name, file_path, df):
+    # Merge every journaled result for this file into the data file in one write
+    pending = journal.pending(file_name)
+    if not pending:
+        return 0
+    
+    keys = article_keys(df)
+    matched = keys.isin(pending.keys())
+    df.loc[matched, "Category_Score_Map"] = keys[matched].map(pending)
+    write_data_file(file_path, df)
+    journal.mark_compacted(file_name, pending.keys())
+    return len(pending)
+
+def process_directory(compact_every=COMPACT_EVERY, engine=None, batch_mode=True):
     input_dir = "FinancialNewsData"
     processed_files = set()
-    progress_file = "processing_progress.json"
+    # Keyword results are compacted into each data file, so fewer, larger files mean fewer rewrites
+    compact_partitions(input_dir)
+    journal = ResultsJournal(PROCESSING_JOURNAL_PATH)
+    engine = engine or create_engine()
     
-    # Load progress if exists
-    processed_indices = {}
-    if os.path.exists(progress_file):
-        try:
-            with open(progress_file, 'r') as f:
-                processed_indices = json.load(f)
-        except:
-            processed_indices = {}
-    
-    for file_name in os.listdir(input_dir):
-        if not file_name.endswith(".csv"):
-            continue
-
-        file_path = os.path.join(input_dir, file_name)
-        df = pd.read_csv(file_path)
+    for file_name, file_path in list_data_files(input_dir):
+        df = read_data_file(file_path)
         
         if "keywords" in df.columns:
             df.drop(columns=["keywords"], inplace=True)
         
         if "Category_Score_Map" not in df.columns:
             df["Category_Score_Map"] = None
+        df["Category_Score_Map"] = df["Category_Score_Map"].astype(object)
+        
+        # Results journaled by an interrupted run land in the file before anything else
+        if compact_results(journal, file_name, file_path, df):
+            processed_files.add(file_name)
         
-        file_updated = False
-        file_indices = processed_indices.get(file_name, [])
+        keys = article_keys(df)
+        uncompacted = 0
+        pending_rows = []
         
         for idx, row in df.iterrows():
-            # Skip already processed indices for this file
-            if str(idx) in file_indices:
-                continue
-                
             # Skip rows that already have Category_Score_Map
             if not pd.isna(row["Category_Score_Map"]) and row["Category_Score_Map"]:
-                if str(idx) not in file_indices:
-                    file_indices.append(str(idx))
                 continue
                 
             full_text = row.get("Full Text", "")
             
             if not full_text or pd.isna(full_text):
-                if str(idx) not in file_indices:
-                    file_indices.append(str(idx))
                 continue
-                
-            keywords_with_relevance = get_keywords_and_relevance(full_text)
             
+            pending_rows.append((keys[idx], full_text))
+        
+        # Results are journaled in completion order as the engine returns them
+        for key, keywords_with_relevance in score_articles(engine, pending_rows, batch_mode):
             if keywords_with_relevance:
                 print(f"AI Response for article in {file_name}: {keywords_with_relevance}")
                 
-                df.at[idx, "Category_Score_Map"] = str(keywords_with_relevance)
-                df.to_csv(file_path, index=False)
-                file_updated = True
+                journal.record(file_name, key, str(keywords_with_relevance))
+                uncompacted += 1
+                print(f"✅ Processed article in {file_name} and journaled result")
                 
-                # Mark this index as processed
-                if str(idx) not in file_indices:
-                    file_indices.append(str(idx))
-                    
-                # Save progress after each article
-                processed_indices[file_name] = file_indices
-                with open(progress_file, 'w') as f:
-                    json.dump(processed_indices, f)
-                    
-                print(f"✅ Processed article in {file_name} and updated CSV")
+                if uncompacted >= compact_every:
+                    compact_results(journal, file_name, file_path, df)
+                    processed_files.add(file_name)
+                    uncompacted = 0
         
-        if file_updated:
+        if compact_results(journal, file_name, file_path, df):
             processed_files.add(file_name)
-        
-        # Update progress for this file
-        processed_indices[file_name] = file_indices
-        with open(progress_file, 'w') as f:
-            json.dump(processed_indices, f)
+    
+    journal.close()
     
     if not processed_files:
         print("No files were updated. All articles may already have Category_Score_Map data.")
@@ -149,27 +239,23 @@ def clear_category_score_maps():
     input_dir = "FinancialNewsData"
     cleared_files = 0
     
-    for file_name in os.listdir(input_dir):
-        if not file_name.endswith(".csv"):
-            continue
-
-        file_path = os.path.join(input_dir, file_name)
-        df = pd.read_csv(file_path)
+    for file_name, file_path in list_data_files(input_dir):
+        df = read_data_file(file_path)
         
         if "Category_Score_Map" in df.columns:
             df["Category_Score_Map"] = None
-            df.to_csv(file_path, index=False)
+            write_data_file(file_path, df)
             cleared_files += 1
     
-    # Reset progress tracking file
-    progress_file = "processing_progress.json"
-    if os.path.exists(progress_file):
-        os.remove(progress_file)
+    # Reset the results journal
+    journal = ResultsJournal(PROCESSING_JOURNAL_PATH)
+    journal.clear()
+    journal.close()
     
     print(f"✅ Cleared Category_Score_Map in {cleared_files} files and reset processing progress")
 
 if __name__ == "__main__":
     import sys
-    if len(sys.argv) > 1 and sys.argv[1] == "--clear":
+    if "--clear" in sys.argv:
         clear_category_score_maps()
-    process_directory()
+    process_directory(batch_mode="--single" not in sys.argv)
@@ -0,0 +1,282 @@
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from config import (
+    START_DATE, END_DATE, BASE_URL, BUSINESS_URL, SENTIMENT_BATCH_SIZE,
+    PIPELINE_QUEUE_SIZE, PIPELINE_DISCOVERY_WORKERS, PIPELINE_DOWNLOAD_WORKERS,
+    PIPELINE_MODEL_PROCESSES, PIPELINE_REPORT_INTERVAL
+)
+from crawler import Crawler
+from http_cache import HttpCache
+from crawl_state import CrawlState, KEPT, NON_FINANCIAL, BELOW_THRESHOLD, NO_TEXT, FETCH_FAILED
+from storage import save_articles
+
+_STOP = object()
+
+# Model stages run in worker processes; data_fetcher is imported there so the
+# FinBERT weights are loaded once per process and never in the parent
+def _score_articles(items):
+    import data_fetcher
+    by_date = defaultdict(list)
+    for date, link, article_data in items:
+        by_date[date].append((link, article_data))
+
+    rows = []
+    below_threshold = []
+    for date, financial_articles in by_date.items():
+        daily_articles, below_threshold_links = data_fetcher.score_financial_articles(date, financial_articles)
+        rows.extend(daily_articles)
+        below_threshold.extend((date, link) for link in below_threshold_links)
+    data_fetcher.clear_article_caches()
+    return rows, below_threshold
+
+def _filter_and_score_articles(items):
+    # Filtering and scoring share one job so the encodings the filter cascade computes are still in
+    # this process's article caches when the survivors are scored, as in data_fetcher.main
+    import data_fetcher
+    stages = []
+    non_financial = []
+    financial = []
+    for date, link, article_data in items:
+        is_financial, stage, _ = data_fetcher.classify_financial_content(article_data['text'], link)
+        stages.append(stage)
+        if is_financial:
+            financial.append((date, link, article_data))
+        else:
+            non_financial.append((date, link))
+    rows, below_threshold = _score_articles(financial)
+    return stages, non_financial, rows, below_threshold
+
+class Stage:
+    def __init__(self, name, handler, workers=1, queue_size=PIPELINE_QUEUE_SIZE, batch_size=1, batch_timeout=1.0):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.input = queue.Queue(maxsize=queue_size)
+        self.downstream = None
+        self.threads = []
+        self.lock = threading.Lock()
+        self.active_workers = 0
+        self.processed = 0
+        self.emitted = 0
+        self.busy_time = 0.0
+
+    def emit(self, item):
+        with self.lock:
+            self.emitted += 1
+        if self.downstream is not None:
+            self.downstream.input.put(item)
+
+    def _next_batch(self):
+        item = self.input.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.batch_timeout
+        while len(batch) < self.batch_size:
+            try:
+                item = self.input.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            batch, stopped = self._next_batch()
+            if not batch:
+                continue
+            started = time.monotonic()
+            try:
+                self.handler(batch if self.batch_size > 1 else batch[0], self.emit)
+            except Exception as e:
+                print(f"Error in {self.name} stage: {e}")
+            with self.lock:
+                self.processed += len(batch)
+                self.busy_time += time.monotonic() - started
+
+        with self.lock:
+            self.active_workers -= 1
+            last_worker = self.active_workers == 0
+        if last_worker and self.downstream is not None:
+            for _ in range(self.downstream.workers):
+                self.downstream.input.put(_STOP)
+
+    def start(self):
+        self.active_workers = self.workers
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+class Pipeline:
+    def __init__(self, stages, report_interval=PIPELINE_REPORT_INTERVAL):
+        self.stages = stages
+        for upstream, downstream in zip(stages, stages[1:]):
+            upstream.downstream = downstream
+        self.report_interval = report_interval
+        self.started = None
+        self.done = threading.Event()
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        print(f"\nPipeline status after {elapsed:.0f}s:")
+        for stage in self.stages:
+            print(f"- {stage.name}: processed {stage.processed} ({stage.processed / elapsed:.2f}/s), "
+                  f"emitted {stage.emitted}, queue depth {stage.input.qsize()}, "
+                  f"busy {stage.busy_time / (elapsed * stage.workers):.0%} of {stage.workers} workers")
+
+    def _report_loop(self):
+        while not self.done.wait(self.report_interval):
+            self.report()
+
+    def run(self, items):
+        self.started = time.monotonic()
+        for stage in self.stages:
+            stage.start()
+        reporter = threading.Thread(target=self._report_loop, daemon=True)
+        reporter.start()
+
+        first = self.stages[0]
+        for item in items:
+            first.input.put(item)
+        for _ in range(first.workers):
+            first.input.put(_STOP)
+
+        for stage in self.stages:
+            stage.join()
+        self.done.set()
+        self.report()
+
+def run_pipeline(dates, section_urls=(BASE_URL, BUSINESS_URL), discovery_workers=PIPELINE_DISCOVERY_WORKERS,
+                 download_workers=PIPELINE_DOWNLOAD_WORKERS, model_processes=PIPELINE_MODEL_PROCESSES,
+                 batch_size=SENTIMENT_BATCH_SIZE, state=None, offline=False, resume=False):
+    state = state or CrawlState()
+    crawler = Crawler(cache=HttpCache(offline=offline))
+    # Spawned, not forked: the crawler and stage threads are already running, and a forked child
+    # can inherit a lock one of them held and deadlock
+    model_pool = ProcessPoolExecutor(max_workers=model_processes, mp_context=multiprocessing.get_context("spawn"))
+    counts = Counter()
+    pending_links = {}
+    failed_dates = set()
+    counts_lock = threading.Lock()
+
+    def count(key, amount=1):
+        with counts_lock:
+            counts[key] += amount
+
+    # A date is completed once every link found for it reached a final outcome; a date with
+    # any failed fetch stays pending so the next run retries the URLs that were not recorded
+    def settle(date, amount=1, failed=False):
+        date = date.strftime("%Y-%m-%d") if not isinstance(date, str) else date
+        with counts_lock:
+            if failed:
+                failed_dates.add(date)
+            pending_links[date] -= amount
+            completed = pending_links[date] == 0 and date not in failed_dates
+        if completed:
+            state.mark_date_completed(date)
+
+    def discover(date, emit):
+        links = set()
+        failed = False
+        for section_url in section_urls:
+            section_links = crawler.fetch_links(date, section_url)
+            if section_links is None:
+                failed = True
+            else:
+                links.update(section_links)
+        if resume:
+            links = [link for link in links if not state.is_url_scored(link)]
+        print(f"Found {len(links)} total articles to process for {date.strftime('%Y-%m-%d')}")
+        with counts_lock:
+            pending_links[date.strftime("%Y-%m-%d")] = len(links) + 1
+        for link in links:
+            emit((date, link))
+        if failed:
+            count("failed section fetches")
+        settle(date, failed=failed)
+
+    def download(item, emit):
+        date, link = item
+        article_data = crawler.fetch_article(link)
+        if article_data is None:
+            count("failed article fetches")
+            settle(date, failed=True)
+        elif article_data['text']:
+            emit((date, link, article_data))
+        elif article_data.get('error'):
+            count("permanently failed article fetches")
+            state.record_urls([link], FETCH_FAILED, date)
+            settle(date)
+        else:
+            state.record_urls([link], NO_TEXT, date)
+            settle(date)
+
+    def filter_and_score(items, emit):
+        stages, non_financial, rows, below_threshold = model_pool.submit(_filter_and_score_articles, items).result()
+        for stage in stages:
+            count(f"filter stage: {stage}")
+        count("filtered non-financial", len(non_financial))
+        for date, link in non_financial:
+            state.record_urls([link], NON_FINANCIAL, date)
+            settle(date)
+        count("filtered below sentiment threshold", len(below_threshold))
+        for date, link in below_threshold:
+            state.record_urls([link], BELOW_THRESHOLD, date)
+            settle(date)
+        if rows:
+            emit(rows)
+
+    def sink(rows, emit):
+        by_year = defaultdict(list)
+        for row in rows:
+            by_year[row[0][:4]].append(row)
+        for year, data in by_year.items():
+            save_articles(data, year)
+        count("saved", len(rows))
+        for row in rows:
+            state.record_urls([row[2]], KEPT, row[0])
+            settle(row[0])
+
+    pipeline = Pipeline([
+        Stage("discovery", discover, workers=discovery_workers),
+        Stage("download", download, workers=download_workers),
+        Stage("model", filter_and_score, workers=model_processes, batch_size=batch_size),
+        Stage("sink", sink),
+    ])
+
+    try:
+        pipeline.run(dates)
+    finally:
+        model_pool.shutdown()
+        crawler.close()
+        state.close()
+
+    print("\nPipeline totals:")
+    for key, value in sorted(counts.items()):
+        print(f"- {key}: {value}")
+    print(f"Crawl state: {state.summary()}")
+    return counts
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    processes = int(args[0]) if args else PIPELINE_MODEL_PROCESSES
+    resume = "--resume" in sys.argv
+    state = CrawlState()
+    run_pipeline(state.pending_dates(START_DATE, END_DATE, resume),
+                 model_processes=processes, state=state, offline="--offline" in sys.argv, resume=resume)
@@ -0,0 +1,60 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+class ResultsJournal:
+    def __init__(self, path="processing_journal.db"):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                file TEXT NOT NULL,
+                url TEXT NOT NULL,
+                category_score_map TEXT NOT NULL,
+                compacted INTEGER NOT NULL DEFAULT 0,
+                processed_at TEXT NOT NULL,
+                PRIMARY KEY (file, url)
+            )
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def record(self, file_name, url, category_score_map):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (file, url, category_score_map, compacted, processed_at) "
+                "VALUES (?, ?, ?, 0, ?)",
+                (file_name, url, category_score_map, datetime.now().isoformat())
+            )
+            self.conn.commit()
+
+    def pending(self, file_name):
+        with self.lock:
+            return dict(self.conn.execute(
+                "SELECT url, category_score_map FROM results WHERE file = ? AND compacted = 0", (file_name,)
+            ))
+
+    def mark_compacted(self, file_name, urls):
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE results SET compacted = 1 WHERE file = ? AND url = ?",
+                [(file_name, url) for url in urls]
+            )
+            self.conn.commit()
+
+    def rename_files(self, old_names, new_name):
+        # Results follow their rows when several data files are merged into one
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE OR REPLACE results SET file = ? WHERE file = ?",
+                [(new_name, old_name) for old_name in old_names]
+            )
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM results")
+            self.conn.commit()
@@ -0,0 +1,170 @@
+import math
+import re
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from config import BM25_K1, BM25_B, HEADLINE_BOOST, RRF_K, RETRIEVAL_CANDIDATES
+from storage import article_id_for_url
+from vector_index import VectorIndex, load_corpus_articles, PREVIEW_CHARS
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9&.\-]*[a-z0-9]|[a-z0-9]")
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have he her his in is it its of on or our she that the their they this
+to was we were will with would said says after also than then there these those which who into over more not
+""".split())
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+class BM25Index:
+    def __init__(self, documents, k1=BM25_K1, b=BM25_B, headline_boost=HEADLINE_BOOST):
+        # documents: list of (headline, full_text); headline terms count headline_boost times
+        self.k1 = k1
+        self.b = b
+        postings = defaultdict(list)
+        lengths = np.zeros(len(documents), dtype="float32")
+        for doc_id, (headline, full_text) in enumerate(documents):
+            counts = Counter(tokenize(full_text))
+            for token in tokenize(headline):
+                counts[token] += headline_boost
+            lengths[doc_id] = sum(counts.values())
+            for token, count in counts.items():
+                postings[token].append((doc_id, count))
+
+        self.num_docs = len(documents)
+        self.avg_length = float(lengths.mean()) if len(documents) else 0.0
+        self.length_norm = (k1 * (1 - b + b * lengths / max(self.avg_length, 1e-9))).astype("float32")
+        self.postings = {}
+        for token, entries in postings.items():
+            doc_ids = np.fromiter((doc_id for doc_id, _ in entries), dtype="int32", count=len(entries))
+            tfs = np.fromiter((tf for _, tf in entries), dtype="float32", count=len(entries))
+            idf = math.log(1 + (self.num_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+            self.postings[token] = (doc_ids, tfs, idf)
+
+    def search(self, query_text, k=10):
+        scores = np.zeros(self.num_docs, dtype="float32")
+        for token in set(tokenize(query_text)):
+            if token not in self.postings:
+                continue
+            doc_ids, tfs, idf = self.postings[token]
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + self.length_norm[doc_ids])
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        top = matched[np.argsort(-scores[matched])[:k]]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in top]
+
+    def memory_bytes(self):
+        return sum(doc_ids.nbytes + tfs.nbytes for doc_ids, tfs, _ in self.postings.values()) + self.length_norm.nbytes
+
+def reciprocal_rank_fusion(ranked_lists, k=RRF_K, weights=None):
+    fused = defaultdict(float)
+    for list_index, ranked in enumerate(ranked_lists):
+        weight = weights[list_index] if weights else 1.0
+        for rank, key in enumerate(ranked):
+            fused[key] += weight / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+class HybridRetriever:
+    def __init__(self, articles=None, vector_index=None, weights=(1.0, 1.0)):
+        started = time.perf_counter()
+        articles = articles if articles is not None else load_corpus_articles()
+        # One document per URL, keeping the first copy as the vector index does, so BM25 and the
+        # URL lookup for dense results refer to the same documents
+        unique_articles = {}
+        for article in articles:
+            unique_articles.setdefault(article["url"], article)
+        articles = list(unique_articles.values())
+        self.weights = weights
+        self.articles = [
+            {
+                "article_id": article_id_for_url(article["url"]),
+                "heading": article["heading"],
+                "url": article["url"],
+                "full_text": article["full_text"][:PREVIEW_CHARS],
+                "last_updated": article.get("date"),
+            }
+            for article in articles
+        ]
+        self.doc_ids_by_url = {article["url"]: doc_id for doc_id, article in enumerate(self.articles)}
+        self.bm25 = BM25Index([(article["heading"], article["full_text"]) for article in articles])
+        self.vector_index = vector_index if vector_index is not None else VectorIndex()
+        self.build_seconds = time.perf_counter() - started
+
+    def __len__(self):
+        return len(self.articles)
+
+    def _matches(self, article, filters):
+        if not filters:
+            return True
+        date = article.get("last_updated") or ""
+        if filters.get("date_from") and date < filters["date_from"]:
+            return False
+        if filters.get("date_to") and date > filters["date_to"]:
+            return False
+        if filters.get("exclude_urls") and article["url"] in filters["exclude_urls"]:
+            return False
+        return True
+
+    def search(self, news_text, k=10, filters=None):
+        started = time.perf_counter()
+        candidates = max(RETRIEVAL_CANDIDATES, k * 5)
+
+        lexical = [doc_id for doc_id, _ in self.bm25.search(news_text, candidates)]
+        dense = [
+            self.doc_ids_by_url[result["url"]]
+            for result in self.vector_index.search(news_text, candidates)
+            if result["url"] in self.doc_ids_by_url
+        ]
+
+        results = []
+        for doc_id, score in reciprocal_rank_fusion([lexical, dense], weights=self.weights):
+            article = self.articles[doc_id]
+            if self._matches(article, filters):
+                results.append(dict(article, score=score))
+            if len(results) >= k:
+                break
+
+        print(f"Hybrid search over {len(self)} articles in {1000 * (time.perf_counter() - started):.1f}ms "
+              f"({len(lexical)} lexical, {len(dense)} dense candidates)")
+        return results
+
+def benchmark(num_queries=50):
+    import tracemalloc
+    tracemalloc.start()
+    retriever = HybridRetriever()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Built hybrid index over {len(retriever)} articles in {retriever.build_seconds:.2f}s "
+          f"(peak {peak / 1024 ** 2:.1f} MiB traced, BM25 postings {retriever.bm25.memory_bytes() / 1024 ** 2:.1f} MiB)")
+    if not len(retriever):
+        return
+
+    rng = np.random.default_rng(0)
+    queries = [retriever.articles[i]["heading"] for i in rng.choice(len(retriever), min(num_queries, len(retriever)), replace=False)]
+    timings = {"bm25": [], "dense": [], "hybrid": []}
+    for query in queries:
+        started = time.perf_counter()
+        retriever.bm25.search(query, RETRIEVAL_CANDIDATES)
+        timings["bm25"].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        retriever.vector_index.search(query, RETRIEVAL_CANDIDATES)
+        timings["dense"].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        retriever.search(query, 10)
+        timings["hybrid"].append(time.perf_counter() - started)
+
+    for name, values in timings.items():
+        values = np.array(values) * 1000
+        print(f"{name}: p50 {np.percentile(values, 50):.1f}ms, p95 {np.percentile(values, 95):.1f}ms")
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        benchmark()
+    elif len(sys.argv) > 1:
+        for result in HybridRetriever().search(" ".join(sys.argv[1:])):
+            print(f"{result['score']:.4f}  {result['last_updated']}  {result['heading']}")
@@ -0,0 +1,188 @@
+import csv
+import os
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config import OUTPUT_DIR, STORAGE_FORMAT, PROCESSING_JOURNAL_PATH
+from results_journal import ResultsJournal
+
+CSV_COLUMNS = ['Date', 'Headline', 'URL', 'Full Text', 'Sentiment', 'Sentiment Probability', 'Positive Score', 'Negative Score', 'Neutral Score', 'Keywords']
+PARQUET_DIR = os.path.join(OUTPUT_DIR, "parquet")
+DICTIONARY_COLUMNS = ['Sentiment', 'Keywords']
+MONTH_FILE = "articles.parquet"
+
+ARTICLE_SCHEMA = pa.schema([
+    ('Date', pa.string()),
+    ('Headline', pa.string()),
+    ('URL', pa.string()),
+    ('Full Text', pa.string()),
+    ('Sentiment', pa.string()),
+    ('Sentiment Probability', pa.float64()),
+    ('Positive Score', pa.float64()),
+    ('Negative Score', pa.float64()),
+    ('Neutral Score', pa.float64()),
+    ('Keywords', pa.string()),
+    ('Category_Score_Map', pa.string()),
+])
+
+def article_id_for_url(url):
+    # Stable across exports and retrieval, so an ID pasted back into the app always resolves
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, url))
+
+def save_to_csv(data, year):
+    if not data: 
+        print(f"No financial articles met the criteria for {year}.")
+        return False
+        
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+    
+    filename = f"{OUTPUT_DIR}/financial_news_{year}.csv"
+    file_exists = os.path.isfile(filename)
+    
+    with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        if not file_exists:
+            writer.writerow(CSV_COLUMNS)
+        writer.writerows(data)
+    
+    print(f"Saved {len(data)} financial articles to {filename}")
+    return True
+
+def save_to_parquet(data, year):
+    if not data:
+        print(f"No financial articles met the criteria for {year}.")
+        return False
+    
+    df = pd.DataFrame(data, columns=CSV_COLUMNS)
+    df["Category_Score_Map"] = None
+    dates = pd.to_datetime(df["Date"])
+    
+    for (part_year, part_month), part in df.groupby([dates.dt.year, dates.dt.month]):
+        partition_dir = os.path.join(PARQUET_DIR, f"year={part_year}", f"month={part_month:02d}")
+        os.makedirs(partition_dir, exist_ok=True)
+        # One file per month: a save rewrites it rather than adding a part file, so readers that
+        # work file by file (news_processor, the graph export) do their per-file work once a month
+        filename = os.path.join(partition_dir, MONTH_FILE)
+        if os.path.exists(filename):
+            part = pd.concat([read_data_file(filename), part], ignore_index=True)
+        write_data_file(filename, part)
+    
+    print(f"Saved {len(data)} financial articles to {PARQUET_DIR}")
+    return True
+
+def save_articles(data, year):
+    if STORAGE_FORMAT == "parquet":
+        return save_to_parquet(data, year)
+    return save_to_csv(data, year)
+
+def list_data_files(input_dir=OUTPUT_DIR):
+    if STORAGE_FORMAT == "parquet":
+        parquet_dir = os.path.join(input_dir, "parquet")
+        files = []
+        for root, _, names in os.walk(parquet_dir):
+            files.extend(os.path.join(root, name) for name in names if name.endswith(".parquet"))
+        if not files and any(name.endswith(".csv") for name in os.listdir(input_dir)):
+            print("No Parquet data found; run `python storage.py --migrate` to convert the CSV files.")
+        return [(os.path.relpath(path, parquet_dir), path) for path in sorted(files)]
+    
+    return [(name, os.path.join(input_dir, name)) for name in sorted(os.listdir(input_dir)) if name.endswith(".csv")]
+
+def read_data_file(path, columns=None):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    if columns is not None:
+        # Tolerate columns that older CSV files do not have yet
+        header = pd.read_csv(path, nrows=0).columns
+        columns = [column for column in columns if column in header]
+    return pd.read_csv(path, usecols=columns)
+
+def write_data_file(path, df):
+    if path.endswith(".parquet"):
+        df = df.reindex(columns=ARTICLE_SCHEMA.names)
+        df["Category_Score_Map"] = df["Category_Score_Map"].astype(object).where(df["Category_Score_Map"].notna(), None)
+        table = pa.Table.from_pandas(df, schema=ARTICLE_SCHEMA, preserve_index=False)
+        temp_path = f"{path}.tmp"
+        pq.write_table(table, temp_path, compression="zstd", use_dictionary=DICTIONARY_COLUMNS)
+        os.replace(temp_path, path)
+    else:
+        temp_path = f"{path}.tmp"
+        df.to_csv(temp_path, index=False)
+        os.replace(temp_path, path)
+
+def load_articles(columns=None, filters=None, input_dir=OUTPUT_DIR):
+    if STORAGE_FORMAT == "parquet":
+        return pd.read_parquet(os.path.join(input_dir, "parquet"), columns=columns, filters=filters)
+    frames = [read_data_file(path, columns) for _, path in list_data_files(input_dir)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+def drop_duplicate_urls(df):
+    # A row can be present twice after a re-run migration or an interrupted compaction;
+    # keep one copy per URL, preferring a copy that already has its Category_Score_Map
+    ordered = df.iloc[df["Category_Score_Map"].notna().to_numpy().argsort(kind="stable")]
+    has_url = ordered["URL"].notna() & (ordered["URL"] != "")
+    return ordered[~(has_url & ordered["URL"].duplicated(keep="last"))].sort_index()
+
+def compact_partitions(input_dir=OUTPUT_DIR, journal_path=PROCESSING_JOURNAL_PATH):
+    # Merges every year=/month= partition holding several files (part files from earlier saves,
+    # migrated CSVs) into its single month file
+    parquet_dir = os.path.join(input_dir, "parquet")
+    if STORAGE_FORMAT != "parquet" or not os.path.isdir(parquet_dir):
+        return 0
+    
+    compacted = 0
+    for root, _, names in os.walk(parquet_dir):
+        files = sorted(name for name in names if name.endswith(".parquet"))
+        if not files or files == [MONTH_FILE]:
+            continue
+        
+        paths = sorted((os.path.join(root, name) for name in files), key=os.path.getmtime)
+        target = os.path.join(root, MONTH_FILE)
+        df = drop_duplicate_urls(pd.concat([read_data_file(path) for path in paths], ignore_index=True))
+        write_data_file(target, df)
+        
+        # Results journaled against the old files must still find their rows
+        old_paths = [path for path in paths if path != target]
+        if os.path.exists(journal_path):
+            journal = ResultsJournal(journal_path)
+            try:
+                journal.rename_files([os.path.relpath(path, parquet_dir) for path in old_paths], os.path.relpath(target, parquet_dir))
+            finally:
+                journal.close()
+        for path in old_paths:
+            os.remove(path)
+        
+        compacted += 1
+        print(f"Compacted {len(paths)} files into {os.path.relpath(target, parquet_dir)} ({len(df)} articles)")
+    
+    return compacted
+
+def migrate_csv_to_parquet(input_dir=OUTPUT_DIR):
+    migrated = 0
+    for file_name in sorted(os.listdir(input_dir)):
+        if not file_name.endswith(".csv"):
+            continue
+        
+        df = pd.read_csv(os.path.join(input_dir, file_name))
+        if "keywords" in df.columns:
+            df.drop(columns=["keywords"], inplace=True)
+        dates = pd.to_datetime(df["Date"])
+        
+        for (year, month), part in df.groupby([dates.dt.year, dates.dt.month]):
+            partition_dir = os.path.join(input_dir, "parquet", f"year={year}", f"month={month:02d}")
+            os.makedirs(partition_dir, exist_ok=True)
+            # Named after the source file so re-running the migration overwrites instead of duplicating
+            write_data_file(os.path.join(partition_dir, f"{file_name[:-4]}.parquet"), part)
+        
+        migrated += len(df)
+        print(f"✅ Migrated {len(df)} articles from {file_name}")
+    
+    print(f"✅ Migrated {migrated} articles to {os.path.join(input_dir, 'parquet')}")
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "--migrate":
+        migrate_csv_to_parquet()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--compact":
+        print(f"✅ Compacted {compact_partitions()} partitions")
@@ -0,0 +1,15 @@
+import time
+
+def timed_stream(chunks, label, timings=None):
+    # Passes chunks through untouched while recording time-to-first-token and total time
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if "first_token" not in timings:
+            timings["first_token"] = time.perf_counter() - started
+        yield chunk
+    timings["total"] = time.perf_counter() - started
+    timings.setdefault("first_token", timings["total"])
+    print(f"{label}: first token after {timings['first_token']:.2f}s, complete after {timings['total']:.2f}s")
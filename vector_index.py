@@ -0,0 +1,213 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from config import VECTOR_INDEX_DIR, CATEGORY_EMBEDDING_MODEL, IVF_MIN_VECTORS, IVF_NPROBE
+from embeddings import embed_texts
+
+PREVIEW_CHARS = 500
+
+def article_text(heading, full_text):
+    return f"{heading}. {full_text[:2000]}"
+
+class VectorIndex:
+    def __init__(self, directory=VECTOR_INDEX_DIR, model_name=CATEGORY_EMBEDDING_MODEL):
+        self.directory = directory
+        self.model_name = model_name
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.articles_path = os.path.join(directory, "articles.jsonl")
+        self.info_path = os.path.join(directory, "index.json")
+        self.ivf_path = os.path.join(directory, "ivf.npz")
+        os.makedirs(directory, exist_ok=True)
+
+        self.info = {"model": model_name, "dim": None, "ivf_trained_on": 0}
+        if os.path.exists(self.info_path):
+            with open(self.info_path) as f:
+                self.info = json.load(f)
+
+        self.articles = []
+        articles_intact = True
+        if os.path.exists(self.articles_path):
+            with open(self.articles_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        self.articles.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        articles_intact = False
+                        break
+
+        self.centroids = None
+        self.assignments = None
+        if os.path.exists(self.ivf_path):
+            ivf = np.load(self.ivf_path)
+            self.centroids = ivf["centroids"]
+            self.assignments = ivf["assignments"]
+        self._reconcile(articles_intact)
+        self.urls = {article["url"] for article in self.articles}
+        self._open_vectors()
+
+    def __len__(self):
+        return len(self.articles)
+
+    def _reconcile(self, articles_intact=True):
+        # add() appends vectors before metadata, so an interrupted add can leave extra (or partial)
+        # vector rows, a torn metadata line or missing IVF assignments; trim everything to the rows both files hold
+        dim = self.info["dim"]
+        vector_bytes = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        rows = min(len(self.articles), vector_bytes // (4 * dim)) if dim else 0
+        if vector_bytes != rows * 4 * (dim or 0):
+            print(f"Truncating {self.vectors_path} to the {rows} vectors that have metadata")
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(rows * 4 * (dim or 0))
+        if len(self.articles) != rows or not articles_intact:
+            print(f"Truncating {self.articles_path} to the {rows} articles that have vectors")
+            self.articles = self.articles[:rows]
+            with open(self.articles_path, "w", encoding="utf-8") as f:
+                for article in self.articles:
+                    f.write(json.dumps(article) + "\n")
+        if self.assignments is not None and len(self.assignments) != rows:
+            # Dropped here and retrained by update_vector_index, rather than searched with missing rows
+            print("IVF assignments do not match the vectors; discarding the IVF lists")
+            self.centroids = None
+            self.assignments = None
+            os.remove(self.ivf_path)
+            self.info["ivf_trained_on"] = 0
+            self._save_info()
+
+    def _open_vectors(self):
+        # Vectors stay on disk and are paged in by the OS as searches touch them
+        if self.articles and self.info["dim"]:
+            self.vectors = np.memmap(self.vectors_path, dtype="float32", mode="r",
+                                     shape=(len(self.articles), self.info["dim"]))
+        else:
+            self.vectors = None
+        self._build_lists()
+
+    def _build_lists(self):
+        if self.assignments is None or self.vectors is None:
+            self.list_order = None
+            return
+        self.list_order = np.argsort(self.assignments, kind="stable")
+        self.list_offsets = np.searchsorted(self.assignments[self.list_order], np.arange(len(self.centroids) + 1))
+
+    def _save_info(self):
+        with open(self.info_path, "w") as f:
+            json.dump(self.info, f)
+
+    def add(self, articles, batch_size=256):
+        # The corpus can list a URL more than once; only its first copy is embedded
+        new_articles = {}
+        for article in articles:
+            if article["url"] and article["url"] not in self.urls:
+                new_articles.setdefault(article["url"], article)
+        new_articles = list(new_articles.values())
+        for start in range(0, len(new_articles), batch_size):
+            batch = new_articles[start:start + batch_size]
+            vectors = embed_texts([article_text(a["heading"], a["full_text"]) for a in batch], self.model_name)
+            if self.info["dim"] != int(vectors.shape[1]):
+                # Saved before any vector is written so that _reconcile always knows the row size
+                self.info["dim"] = int(vectors.shape[1])
+                self._save_info()
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.articles_path, "a", encoding="utf-8") as f:
+                for article in batch:
+                    record = {
+                        "url": article["url"],
+                        "heading": article["heading"],
+                        "date": article.get("date"),
+                        "preview": article["full_text"][:PREVIEW_CHARS]
+                    }
+                    f.write(json.dumps(record) + "\n")
+                    self.articles.append(record)
+                    self.urls.add(article["url"])
+
+            if self.centroids is not None:
+                self.assignments = np.concatenate([self.assignments, np.argmax(vectors @ self.centroids.T, axis=1)])
+                np.savez(self.ivf_path, centroids=self.centroids, assignments=self.assignments)
+
+        self._save_info()
+        self._open_vectors()
+        return len(new_articles)
+
+    def build_ivf(self, n_lists=None, iterations=10, sample_size=50000, seed=0):
+        # Spherical k-means on a sample; every vector is then filed under its nearest centroid
+        rng = np.random.default_rng(seed)
+        n_lists = n_lists or max(1, int(np.sqrt(len(self))))
+        sample = self.vectors[np.sort(rng.choice(len(self), min(sample_size, len(self)), replace=False))]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for list_id in range(n_lists):
+                members = sample[labels == list_id]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[list_id] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        assignments = np.concatenate([
+            np.argmax(self.vectors[start:start + 65536] @ centroids.T, axis=1)
+            for start in range(0, len(self), 65536)
+        ])
+        self.centroids = centroids.astype("float32")
+        self.assignments = assignments.astype("int32")
+        np.savez(self.ivf_path, centroids=self.centroids, assignments=self.assignments)
+        self.info["ivf_trained_on"] = len(self)
+        self._save_info()
+        self._build_lists()
+
+    def search_vector(self, query_vector, k=10, nprobe=IVF_NPROBE):
+        if self.vectors is None:
+            return []
+
+        if self.list_order is not None and nprobe < len(self.centroids):
+            probe = np.argsort(-(self.centroids @ query_vector))[:nprobe]
+            candidates = np.concatenate([
+                self.list_order[self.list_offsets[list_id]:self.list_offsets[list_id + 1]] for list_id in probe
+            ])
+            candidates.sort()
+        else:
+            candidates = np.arange(len(self))
+
+        if not len(candidates):
+            return []
+        scores = self.vectors[candidates] @ query_vector
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(self.articles[candidates[i]], score=float(scores[i])) for i in top]
+
+    def search(self, query_text, k=10, nprobe=IVF_NPROBE):
+        started = time.perf_counter()
+        results = self.search_vector(embed_texts([query_text], self.model_name)[0], k, nprobe)
+        print(f"Vector search over {len(self)} articles in {1000 * (time.perf_counter() - started):.1f}ms")
+        return results
+
+def load_corpus_articles():
+    from storage import load_articles
+    df = load_articles(columns=["Date", "Headline", "URL", "Full Text"]).fillna("")
+    return [
+        {"url": row["URL"], "heading": row["Headline"], "date": str(row["Date"]), "full_text": row["Full Text"]}
+        for _, row in df.iterrows()
+    ]
+
+def update_vector_index(index=None):
+    index = index or VectorIndex()
+    added = index.add(load_corpus_articles())
+    # Retrain the coarse quantizer once the corpus outgrows the one it was trained on
+    if len(index) >= IVF_MIN_VECTORS and (index.centroids is None or len(index) > 2 * index.info["ivf_trained_on"]):
+        index.build_ivf()
+    print(f"✅ Added {added} articles; vector index now holds {len(index)} articles")
+    return index
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "--build":
+        update_vector_index()
+    elif len(sys.argv) > 1:
+        for result in VectorIndex().search(" ".join(sys.argv[1:])):
+            print(f"{result['score']:.3f}  {result['date']}  {result['heading']}")